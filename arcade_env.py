@@ -0,0 +1,572 @@
+# Headless rules for the arcade mini-games: breakout, falling objects, racing,
+# flappy bird, snake and pong. Each game is a state class holding its own
+# random.Random, plus a step_<game>(state, action) function that plays one
+# frame and returns (reward, done). Nothing here opens a window or reads the
+# keyboard, so bots and tuning scripts can play thousands of episodes; the
+# game scripts import the same rules and only draw.
+# Benchmark: python arcade_env.py GAME [EPISODES] [--workers N] [--max-steps N]
+import os
+import sys
+import time
+import math
+import random
+from collections import deque
+import numpy as np
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # Quiet pool workers
+import pygame # Only pygame.Rect, so the collision and rounding rules match the games exactly
+
+# Actions are bit masks, so holding two keys at once works like in the games
+LEFT, RIGHT = 1, 2 # Breakout, falling objects and racing: 4 actions
+FLAP = 1 # Flappy bird: 2 actions
+
+# --- Breakout ---
+BREAKOUT_SERVE_ANGLE = math.radians(75)
+BREAKOUT_SERVE_SPEED = 3
+BREAKOUT_PADDLE_SPEED = 5
+
+class BreakoutState:
+    """034-breakoutgame.py: the serve is always the same, so the seed is unused."""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.ball = pygame.Rect(200, 200, 20, 20)
+        self.ball_speed = [0, 0]
+        self.paddle = pygame.Rect(180, 380, 60, 10)
+        self.score = 0
+
+def step_breakout(state, action):
+    """One frame; reward 1 per paddle hit, done when the ball drops out of the bottom."""
+    ball, paddle, speed = state.ball, state.paddle, state.ball_speed
+    if speed == [0, 0]:
+        speed[:] = [BREAKOUT_SERVE_SPEED * math.cos(BREAKOUT_SERVE_ANGLE),
+                    BREAKOUT_SERVE_SPEED * math.sin(BREAKOUT_SERVE_ANGLE)]
+
+    if action & LEFT and paddle.left > 5:
+        paddle.x -= BREAKOUT_PADDLE_SPEED
+    if action & RIGHT and paddle.right < 395:
+        paddle.x += BREAKOUT_PADDLE_SPEED
+
+    ball.x += speed[0]
+    ball.y += speed[1]
+    if ball.left < 0 or ball.right > 400:
+        speed[0] = -speed[0]
+    if ball.top < 0:
+        speed[1] = -speed[1]
+    reward = 0
+    if ball.colliderect(paddle):
+        speed[1] = -speed[1]
+        state.score += 1
+        reward = 1
+        # Increase ball speed by 10% and shrink the paddle
+        speed[0] *= 1.1
+        speed[1] *= 1.1
+        paddle.width = max(20, paddle.width - 5)
+    return reward, ball.bottom > 400
+
+# --- Falling objects ---
+# Objects live in NumPy columns (x, scroll value at spawn, alive), appended in
+# spawn order. They all fall at the same speed, so a shared scroll counter
+# moves them and spawn order is bottom-to-top order: the objects level with
+# the basket are one contiguous slice found with searchsorted, and the ones
+# off the bottom are a prefix that culling just skips past. Caught objects
+# only clear their alive flag, and the arrays are compacted or doubled when
+# they run out of room, so a frame allocates nothing per object.
+FALLING_SPAWN_CHANCE = 0.02 # Objects per frame; above 1, several spawn each frame
+FALLING_SPEED = 2
+FALLING_SIZE = 20
+BASKET_SPEED = 8
+
+class FallingState:
+    """falling-object.py, with spawn_rate objects per frame on average."""
+
+    def __init__(self, seed=None, spawn_rate=FALLING_SPAWN_CHANCE, capacity=64):
+        self.rng = random.Random(seed)
+        self.spawn_rate = spawn_rate
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.spawned = np.zeros(capacity, dtype=np.int64) # Scroll value when each object appeared
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.reset()
+
+    def reset(self):
+        self.basket_width = 100
+        self.basket = pygame.Rect(150, 380, self.basket_width, 10)
+        self.scroll = 0 # Pixels fallen since the reset
+        self.head = self.tail = 0 # Objects are slots head..tail-1, oldest first
+        self.alive[:] = False
+        self.score = 0
+        self.lives = 3
+
+    def spawn(self, xs):
+        count = len(xs)
+        if self.tail + count > len(self.x):
+            live = slice(self.head, self.tail)
+            used = self.tail - self.head
+            capacity = len(self.x)
+            while used + count > capacity // 2:
+                capacity *= 2
+            for name in ("x", "spawned", "alive"):
+                array = getattr(self, name)
+                moved = np.zeros(capacity, dtype=array.dtype)
+                moved[:used] = array[live]
+                setattr(self, name, moved)
+            self.head, self.tail = 0, used
+        new = slice(self.tail, self.tail + count)
+        self.x[new] = xs
+        self.spawned[new] = self.scroll
+        self.alive[new] = True
+        self.tail += count
+
+    def falling_since(self, scroll, side="left"):
+        """First slot from head on whose object spawned at or after scroll (after, for side="right")."""
+        return self.head + int(self.spawned[self.head:self.tail].searchsorted(scroll, side=side))
+
+    def object_rects(self):
+        """(x, y, w, h) of every falling object, for drawing."""
+        live = self.head + np.flatnonzero(self.alive[self.head:self.tail])
+        ys = self.scroll - self.spawned[live]
+        return [(x, y, FALLING_SIZE, FALLING_SIZE) for x, y in zip(self.x[live].tolist(), ys.tolist())]
+
+def step_falling(state, action):
+    """One frame; reward 1 per catch, done when the last life is lost."""
+    basket = state.basket
+    if action & LEFT and basket.left > 0:
+        basket.x -= BASKET_SPEED
+    if action & RIGHT and basket.right < 400:
+        basket.x += BASKET_SPEED
+
+    whole, part = divmod(state.spawn_rate, 1)
+    count = int(whole) + (state.rng.random() < part)
+    if count:
+        state.spawn([state.rng.randint(0, 380) for _ in range(count)])
+    state.scroll += FALLING_SPEED
+
+    # Objects level with the basket, i.e. basket.top - size < y < basket.bottom;
+    # nothing to test until the oldest object has come down that far
+    reward = 0
+    head, tail = state.head, state.tail
+    if head < tail and state.scroll - state.spawned[head] > basket.top - FALLING_SIZE:
+        lo = state.falling_since(state.scroll - basket.bottom, side="right")
+        hi = state.falling_since(state.scroll - basket.top + FALLING_SIZE)
+        x = state.x[lo:hi]
+        near = lo + (state.alive[lo:hi] & (x < basket.right) & (x + FALLING_SIZE > basket.left)).nonzero()[0]
+        for i in near.tolist(): # Oldest first; the basket can shrink between catches
+            if state.x[i] < basket.right:
+                state.alive[i] = False
+                state.score += 1
+                reward += 1
+                if state.score % 5 == 0:
+                    state.basket_width = max(50, state.basket_width - 10)
+                    basket.width = state.basket_width
+                    basket.x = min(basket.x, 400 - state.basket_width)
+
+    # Off the bottom (y > 400): a prefix of the slots
+    if head < tail and state.scroll - state.spawned[head] > 400:
+        cut = state.falling_since(state.scroll - 400)
+        state.lives -= int(np.count_nonzero(state.alive[head:cut]))
+        state.alive[head:cut] = False
+        state.head = cut
+    return reward, state.lives <= 0
+
+# --- Racing ---
+# Obstacles spawn in 20 px lanes and all move at the same speed, so each one
+# is stored as (lane, scroll value at spawn) and its y is derived from one
+# shared scroll counter: advancing every obstacle is a single addition. Spawn
+# order is also bottom-to-top order, so culling pops from the front of one
+# FIFO, and each lane keeps its own FIFO so the crash test only looks at the
+# lowest obstacles in the one or two lanes under the car.
+CAR_SPEED = 5
+LANE_WIDTH = 20
+LANES = 19 # Obstacle x is a multiple of LANE_WIDTH below 380
+OBSTACLE_HEIGHT = 40
+
+class RacingState:
+    """racing-game.py"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.car = pygame.Rect(190, 360, 20, 40)
+        self.scroll = 0 # Pixels every obstacle has moved since the reset
+        self.obstacles = deque() # (lane, scroll at spawn), oldest and lowest first
+        self.lanes = [deque() for _ in range(LANES)] # Scroll at spawn per lane, oldest first
+        self.score = 0
+
+    def obstacle_y(self, spawned):
+        return self.scroll - spawned - OBSTACLE_HEIGHT
+
+    def obstacle_rects(self):
+        """(x, y, w, h) of every obstacle, for drawing."""
+        return [(lane * LANE_WIDTH, self.scroll - spawned - OBSTACLE_HEIGHT, LANE_WIDTH, OBSTACLE_HEIGHT)
+                for lane, spawned in self.obstacles]
+
+def step_racing(state, action):
+    """One frame; reward 1 per obstacle dodged, done on a crash.
+
+    Every obstacle moves by the speed set by the score at the start of the frame.
+    """
+    car = state.car
+    if action & LEFT and car.left > 0:
+        car.x -= CAR_SPEED
+    if action & RIGHT and car.right < 400:
+        car.x += CAR_SPEED
+
+    # Obstacles come more often and faster as the score grows
+    spawn_rate = 0.08 + (state.score * 0.002)
+    if state.rng.random() < spawn_rate:
+        lane = state.rng.randrange(0, 380, LANE_WIDTH) // LANE_WIDTH
+        state.obstacles.append((lane, state.scroll))
+        state.lanes[lane].append(state.scroll)
+    state.scroll += 4 + (state.score // 10)
+
+    # Off the bottom: the oldest obstacles, at the front of the queues
+    reward = 0
+    obstacles = state.obstacles
+    while obstacles and state.obstacle_y(obstacles[0][1]) > 400:
+        lane, _ = obstacles.popleft()
+        state.lanes[lane].popleft()
+        reward += 1
+    state.score += reward
+
+    # Crash test against the lanes under the car, lowest obstacle first
+    first = max(car.left // LANE_WIDTH, 0)
+    last = min((car.right - 1) // LANE_WIDTH, LANES - 1)
+    for lane in range(first, last + 1):
+        for spawned in state.lanes[lane]:
+            y = state.obstacle_y(spawned)
+            if y + OBSTACLE_HEIGHT <= car.top:
+                break # This one and all above it are clear of the car
+            if y < car.bottom:
+                return reward, True
+    return reward, False
+
+# --- Flappy bird ---
+# Pipes come in (top, bottom) pairs that all scroll at the same speed, and at
+# most PIPE_CAPACITY pairs are ever on screen, so they live in fixed ring
+# buffers: scroll value at spawn, gap centre and a passed flag per slot. The
+# gap centres are drawn PIPE_SCHEDULE_CHUNK at a time from the state's rng,
+# so a seed fixes the whole course, and only the pair over the bird's column
+# is collision-tested.
+GRAVITY = 0.2
+FLAP_SPEED = -5
+PIPE_WIDTH = 50
+PIPE_GAP = 150 # Height of the opening
+PIPE_SPACING = 150 # A new pair comes in once the last one is this far from the right edge
+PIPE_SPEED = 2
+PIPE_CAPACITY = (400 + PIPE_WIDTH) // PIPE_SPACING + 2 # Pairs that can be alive at once, with room to spare
+PIPE_SCHEDULE_CHUNK = 16 # About 20 s of pipes at 60 FPS
+
+class FlappyState:
+    """flappy_bird.py"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.schedule = [] # Upcoming gap centres, next one last; carries over resets
+        self.reset()
+
+    def reset(self):
+        self.bird = pygame.Rect(100, 200, 20, 20)
+        self.bird_vel = 0
+        self.scroll = 0 # Pixels the pipes have moved since the reset
+        self.pair_spawn = [0] * PIPE_CAPACITY # Scroll value when each pair came in
+        self.pair_gap = [0] * PIPE_CAPACITY # Centre of each pair's opening
+        self.pair_passed = [False] * PIPE_CAPACITY
+        self.first = 0 # Slot of the oldest live pair
+        self.count = 0
+        self.score = 0
+
+    def next_gap(self):
+        if not self.schedule:
+            self.schedule = [self.rng.randrange(80, 300) for _ in range(PIPE_SCHEDULE_CHUNK)]
+            self.schedule.reverse() # Popped from the end, so the draws come out in order
+        return self.schedule.pop()
+
+    def pair_x(self, slot):
+        return 400 - (self.scroll - self.pair_spawn[slot])
+
+    def pairs(self):
+        """Ring buffer slots of the live pairs, oldest first."""
+        return [(self.first + i) % PIPE_CAPACITY for i in range(self.count)]
+
+    def pipe_rects(self):
+        """(x, y, w, h) of every top and bottom pipe, for drawing."""
+        rects = []
+        for slot in self.pairs():
+            x, gap = self.pair_x(slot), self.pair_gap[slot]
+            rects.append((x, 0, PIPE_WIDTH, gap - PIPE_GAP // 2))
+            rects.append((x, gap + PIPE_GAP // 2, PIPE_WIDTH, 400 - (gap + PIPE_GAP // 2)))
+        return rects
+
+def step_flappy(state, action):
+    """One frame; reward 1 per pipe pair passed, done on hitting a pipe or the screen edge."""
+    bird = state.bird
+    if action & FLAP:
+        state.bird_vel = FLAP_SPEED
+    state.bird_vel += GRAVITY
+    bird.y += state.bird_vel
+
+    last = (state.first + state.count - 1) % PIPE_CAPACITY
+    if not state.count or state.pair_x(last) < 400 - PIPE_SPACING:
+        slot = (state.first + state.count) % PIPE_CAPACITY
+        state.pair_spawn[slot] = state.scroll
+        state.pair_gap[slot] = state.next_gap()
+        state.pair_passed[slot] = False
+        state.count += 1
+    state.scroll += PIPE_SPEED
+
+    while state.count and state.pair_x(state.first) < -PIPE_WIDTH:
+        state.first = (state.first + 1) % PIPE_CAPACITY
+        state.count -= 1
+
+    reward = 0
+    hit = False
+    for i in range(state.count):
+        slot = (state.first + i) % PIPE_CAPACITY
+        x = state.pair_x(slot)
+        if x >= bird.right:
+            break # This pair and the later ones are still ahead of the bird
+        if x <= bird.x and not state.pair_passed[slot]:
+            state.pair_passed[slot] = True
+            state.score += 1
+            reward += 1
+        if x + PIPE_WIDTH > bird.left: # A pair over the bird's column; there can be more than one
+            gap = state.pair_gap[slot]
+            hit = hit or bird.top < gap - PIPE_GAP // 2 or bird.bottom > gap + PIPE_GAP // 2
+
+    return reward, hit or bird.top < 0 or bird.bottom > 400
+
+# --- Snake ---
+# Positions are (column, row) cells. The body is a deque with the head on the
+# left, mirrored by an occupancy set, and the free cells are kept in a list
+# with a cell -> slot index, so a move, a self-collision test and placing
+# food are all O(1) however long the snake gets.
+SNAKE_COLS, SNAKE_ROWS = 20, 20 # snake_game.py's 400x400 window in 20 px cells
+SNAKE_MOVES = [None, (0, -1), (0, 1), (-1, 0), (1, 0)] # Action: keep going, up, down, left, right
+
+class SnakeState:
+    """snake_game.py on a cols x rows board; the snake waits for its first move after a reset."""
+
+    empty_boards = {} # (cols, rows) -> free list and slot index of an empty board, copied on reset
+
+    def __init__(self, seed=None, cols=SNAKE_COLS, rows=SNAKE_ROWS):
+        self.rng = random.Random(seed)
+        self.cols, self.rows = cols, rows
+        self.reset()
+
+    def reset(self):
+        board = (self.cols, self.rows)
+        if board not in SnakeState.empty_boards:
+            cells = [(x, y) for y in range(self.rows) for x in range(self.cols)]
+            SnakeState.empty_boards[board] = cells, {cell: i for i, cell in enumerate(cells)}
+        cells, slots = SnakeState.empty_boards[board]
+        self.free, self.free_slot = cells[:], slots.copy()
+        self.snake = deque()
+        self.occupied = set()
+        start = (self.cols // 2, self.rows // 2)
+        self.snake.append(start)
+        self.take(start)
+        self.direction = (0, 0)
+        self.score = 0
+        self.place_food()
+
+    def take(self, cell):
+        """Marks a free cell as body: swap-remove from the free list."""
+        i = self.free_slot.pop(cell)
+        last = self.free.pop()
+        if last != cell:
+            self.free[i] = last
+            self.free_slot[last] = i
+        self.occupied.add(cell)
+
+    def release(self, cell):
+        self.occupied.remove(cell)
+        self.free_slot[cell] = len(self.free)
+        self.free.append(cell)
+
+    def place_food(self):
+        """Food goes on a uniformly random free cell; None once the snake fills the board."""
+        self.food = self.rng.choice(self.free) if self.free else None
+
+def step_snake(state, action):
+    """One frame; reward 1 per food eaten, done on hitting a wall or the snake itself, or filling the board."""
+    move = SNAKE_MOVES[action]
+    dx, dy = state.direction
+    if move is not None and move != (-dx, -dy): # No turning straight back
+        state.direction = dx, dy = move
+    if (dx, dy) == (0, 0):
+        return 0, False
+
+    snake = state.snake
+    head = (snake[0][0] + dx, snake[0][1] + dy)
+    if not (0 <= head[0] < state.cols and 0 <= head[1] < state.rows):
+        return 0, True
+    ate = head == state.food
+    if not ate:
+        state.release(snake.pop()) # The tail moves on first, so following it is safe
+    if head in state.occupied:
+        return 0, True
+    snake.appendleft(head)
+    state.take(head)
+    if not ate:
+        return 0, False
+    state.score += 1
+    state.place_food()
+    return 1, state.food is None
+
+# --- Pong ---
+PONG_WIDTH = 800
+PONG_HEIGHT = 600
+LEFT_PADDLE_X = 50
+LEFT_PADDLE_Y = 250
+RIGHT_PADDLE_X = 730
+RIGHT_PADDLE_Y = 250
+PADDLE_WIDTH = 20
+PADDLE_HEIGHT = 100
+PADDLE_SPEED = 5
+BALL_INIT_X = 390
+BALL_INIT_Y = 290
+BALL_RESET_X = 400
+BALL_RESET_Y = 300
+BALL_SIZE = 20
+BALL_BASE_SPEED = 5
+BALL_ANGLE_MIN = -math.pi / 4  # -45 degrees
+BALL_ANGLE_MAX = math.pi / 4   # +45 degrees
+BALL_SPEED_MULTIPLIER = 1.1
+# Pong actions drive both paddles: 16 actions
+LEFT_UP, LEFT_DOWN, RIGHT_UP, RIGHT_DOWN = 1, 2, 4, 8
+
+class PongState:
+    """pygame/my_pong.py; score is [left player, right player]."""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.left_paddle = pygame.Rect(LEFT_PADDLE_X, LEFT_PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT)
+        self.right_paddle = pygame.Rect(RIGHT_PADDLE_X, RIGHT_PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT)
+        self.ball = pygame.Rect(BALL_INIT_X, BALL_INIT_Y, BALL_SIZE, BALL_SIZE)
+        self.ball_speed = [0, 0]
+        self.score = [0, 0]
+
+    def serve(self):
+        self.ball.center = (BALL_RESET_X, BALL_RESET_Y)
+        angle = self.rng.uniform(BALL_ANGLE_MIN, BALL_ANGLE_MAX)
+        direction = self.rng.choice([-1, 1])
+        self.ball_speed[0] = direction * BALL_BASE_SPEED * math.cos(angle)
+        self.ball_speed[1] = BALL_BASE_SPEED * math.sin(angle)
+
+def step_pong(state, action):
+    """One frame; reward +1 when the left player scores, -1 when the right one does.
+
+    Pong has no end, so done is always False; batch runs stop at max_steps.
+    """
+    left, right, ball, speed = state.left_paddle, state.right_paddle, state.ball, state.ball_speed
+    if action & LEFT_UP and left.top > 0:
+        left.y -= PADDLE_SPEED
+    if action & LEFT_DOWN and left.bottom < PONG_HEIGHT:
+        left.y += PADDLE_SPEED
+    if action & RIGHT_UP and right.top > 0:
+        right.y -= PADDLE_SPEED
+    if action & RIGHT_DOWN and right.bottom < PONG_HEIGHT:
+        right.y += PADDLE_SPEED
+
+    if speed == [0, 0]:
+        state.serve()
+    ball.x += speed[0]
+    ball.y += speed[1]
+    if ball.top <= 0 or ball.bottom >= PONG_HEIGHT:
+        speed[1] = -speed[1]
+    if ball.colliderect(left) or ball.colliderect(right):
+        speed[0] = -speed[0] * BALL_SPEED_MULTIPLIER
+        speed[1] *= BALL_SPEED_MULTIPLIER
+
+    reward = 0
+    if ball.left <= 0:
+        state.score[1] += 1
+        reward -= 1
+        state.serve()
+    if ball.right >= PONG_WIDTH:
+        state.score[0] += 1
+        reward += 1
+        state.serve()
+    return reward, False
+
+# --- Batch runner ---
+GAMES = { # name -> (state class, step function, number of actions)
+    "breakout": (BreakoutState, step_breakout, 4),
+    "falling": (FallingState, step_falling, 4),
+    "racing": (RacingState, step_racing, 4),
+    "flappy": (FlappyState, step_flappy, 2),
+    "snake": (SnakeState, step_snake, len(SNAKE_MOVES)),
+    "pong": (PongState, step_pong, 16),
+}
+
+def run_episodes(args):
+    """Process-pool worker: plays episodes with seeds first_seed, first_seed + 1, ...
+
+    policy(state, rng) picks each action (uniformly random when None) and
+    must be a module-level function so it can be sent to the workers. The
+    policy's rng is seeded from the episode seed too, so every episode is
+    reproducible on its own. Returns one (total reward, steps, finished)
+    tuple per episode; finished is False when max_steps cut it short.
+    """
+    game, first_seed, count, max_steps, policy = args
+    new_state, step, num_actions = GAMES[game]
+    results = []
+    for seed in range(first_seed, first_seed + count):
+        state = new_state(seed)
+        rng = random.Random(f"policy-{seed}")
+        total = steps = 0
+        done = False
+        while not done and steps < max_steps:
+            action = policy(state, rng) if policy else rng.randrange(num_actions)
+            reward, done = step(state, action)
+            total += reward
+            steps += 1
+        results.append((total, steps, done))
+    return results
+
+def run_episodes_pool(game, episodes=10000, chunk=250, max_steps=10000, seed=0, policy=None, workers=None):
+    """Spreads episodes across a process pool (one worker per core by default).
+
+    Episode i always uses seed + i, so the results, returned in episode
+    order, do not depend on the number of workers. Returns (results, seconds).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if game not in GAMES:
+        raise ValueError(f"Unknown game {game!r}, expected one of {', '.join(GAMES)}")
+    jobs = [(game, seed + start, min(chunk, episodes - start), max_steps, policy)
+            for start in range(0, episodes, chunk)]
+
+    begin = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for part in pool.map(run_episodes, jobs):
+            results.extend(part)
+    return results, time.perf_counter() - begin
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {}
+    for name in ("--workers", "--max-steps"):
+        if name in args:
+            index = args.index(name)
+            options[name] = int(args[index + 1])
+            del args[index:index + 2]
+    if not args:
+        sys.exit(f"usage: python arcade_env.py {{{','.join(GAMES)}}} [EPISODES] [--workers N] [--max-steps N]")
+    game = args[0]
+    episodes = int(args[1]) if len(args) > 1 else 10000
+    results, seconds = run_episodes_pool(game, episodes, max_steps=options.get("--max-steps", 10000),
+                                         workers=options.get("--workers"))
+    steps = sum(s for _, s, _ in results)
+    finished = sum(1 for _, _, done in results if done)
+    print(f"{game}: {episodes} episodes, {steps} steps in {seconds:.2f}s ({steps / seconds:.0f} steps/s), "
+          f"{finished} finished, average reward {sum(r for r, _, _ in results) / episodes:.2f}")
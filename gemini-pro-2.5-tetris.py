@@ -1,11 +1,24 @@
 # Pygame Tetris - Fancy Edition (v2 - Mac Fix Attempt)
 # Built for Pyodide compatibility (no external files for sounds/fonts initially)
 
-import pygame
 import random
 import math
 import time
 import sys
+import os
+import zlib
+import threading
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Pygame is only needed for the front end; the TetrisSim core runs without it
+try:
+    import pygame
+    PYGAME_AVAILABLE = True
+except ImportError:
+    pygame = None
+    PYGAME_AVAILABLE = False
 
 # Try importing numpy for sound generation, handle potential ImportError
 try:
@@ -21,6 +34,8 @@ SCREEN_HEIGHT = 700
 PLAY_WIDTH = 300  # 10 blocks wide
 PLAY_HEIGHT = 600 # 20 blocks high
 BLOCK_SIZE = 30
+GRID_COLS = 10
+GRID_ROWS = 20
 
 GRID_TOP_LEFT_X = (SCREEN_WIDTH - PLAY_WIDTH) // 2
 GRID_TOP_LEFT_Y = SCREEN_HEIGHT - PLAY_HEIGHT - 50 # Position grid lower
@@ -78,6 +93,11 @@ GAME_OVER_FADE_DURATION = 1.5 # seconds
 DAS_DELAY = 0.16 # Delayed Auto Shift - seconds before continuous horizontal move
 ARR_DELAY = 0.03 # Auto Repeat Rate - seconds between moves during DAS
 
+# Frame timing: game logic runs in fixed ticks, drawing at whatever rate the display manages
+LOGIC_RATE = 120 # Logic ticks per second
+RENDER_FPS = 60 # Frame cap passed to clock.tick (0 = uncapped)
+MAX_CATCH_UP_TICKS = 12 # Ticks one frame may run after a stall; older lag is dropped
+
 # Sound Frequencies (simple tones)
 FREQ_LAND = 100
 FREQ_CLEAR = 440
@@ -88,142 +108,173 @@ FREQ_ROTATE = 300
 FREQ_HARD_DROP = 150
 
 # --- Pygame Initialization ---
-pygame.init()
-# Attempt initializing mixer, handle potential failure
-try:
-    pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512) # Smaller buffer for less latency
-    MIXER_INITIATED = True
-except pygame.error as e:
-    print(f"Warning: Pygame mixer could not be initiated: {e}. Sound disabled.")
-    MIXER_INITIATED = False
-
-
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Pygame Tetris - Fancy Edition")
-clock = pygame.time.Clock()
-
-# --- Font ---
-# Fallback included directly in SysFont call
-main_font = pygame.font.SysFont("consolas, mono,arial", 35, bold=True)
-score_font = pygame.font.SysFont("consolas, mono, arial", 50, bold=True)
-small_font = pygame.font.SysFont("consolas, mono, arial", 25)
-game_over_font = pygame.font.SysFont("consolas, mono, arial", 70, bold=True)
+# Nothing touches the display or mixer at import time; main() calls init_pygame()
+screen = None
+clock = None
+main_font = None
+score_font = None
+small_font = None
+game_over_font = None
+profile_font = None
+MIXER_INITIATED = False
+
+def init_pygame():
+    """Opens the window, loads fonts and starts the sound bank. Called once by main()."""
+    global screen, clock, main_font, score_font, small_font, game_over_font, profile_font
+    pygame.display.init() # The mixer starts later, on the sound bank's thread
+    pygame.font.init()
+
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Pygame Tetris - Fancy Edition")
+    clock = pygame.time.Clock()
+
+    # --- Font ---
+    # Fallback included directly in SysFont call
+    main_font = pygame.font.SysFont("consolas, mono,arial", 35, bold=True)
+    score_font = pygame.font.SysFont("consolas, mono, arial", 50, bold=True)
+    small_font = pygame.font.SysFont("consolas, mono, arial", 25)
+    game_over_font = pygame.font.SysFont("consolas, mono, arial", 70, bold=True)
+    profile_font = pygame.font.SysFont("consolas, mono, arial", 14)
+
+    sound_bank.start()
 
 
 # --- Sound Generation ---
-SOUND_ENABLED = NUMPY_AVAILABLE and MIXER_INITIATED
-sound_cache = {}
-
-def generate_tone(frequency, duration_ms, vol=0.1):
-    if not SOUND_ENABLED:
-        # Create a dummy sound object if sound is disabled
-        return pygame.mixer.Sound(buffer=np.array([[0,0]], dtype=np.int16)) # Minimal valid buffer
-
-    sound_key = (frequency, duration_ms)
-    if sound_key in sound_cache:
-        return sound_cache[sound_key]
-
-    try:
-        sample_rate = pygame.mixer.get_init()[0]
-        num_samples = int(sample_rate * duration_ms / 1000.0)
-
-        buf = np.zeros((num_samples, 2), dtype=np.int16) # Stereo
-        max_sample = 2**(16 - 1) - 1
-
-        # Simple sine wave
-        t = np.linspace(0., duration_ms / 1000.0, num_samples)
-        wave = (vol * max_sample * np.sin(2. * np.pi * frequency * t)).astype(np.int16)
-        
-        # Basic fade in/out to reduce clicks
-        fade_len = min(num_samples // 10, sample_rate // 100) # ~10ms fade max
+# Effects are plain sine tones. SoundBank builds them on a background thread so
+# the window opens straight away, and keeps the raw PCM in SOUND_CACHE_DIR,
+# keyed by (frequencies, duration, volume, sample rate): later launches just
+# memory-map the files. Until an effect is ready, playing it is a no-op.
+SOUND_ENABLED = False # Set once the mixer is up
+MIXER_FREQUENCY = 22050
+SOUND_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fancy-tetris", "sounds")
+
+# Event name -> (frequencies, duration per note in ms, volume); several frequencies make a sequence
+SOUND_EFFECTS = {
+    "land": ((FREQ_LAND,), 75, 0.08),
+    "clear": ((FREQ_CLEAR,), 150, 0.1),
+    "multi_clear": ((FREQ_MULTI_CLEAR,), 250, 0.12),
+    "game_over": (tuple(FREQ_GAME_OVER), 300, 0.15),
+    "rotate": ((FREQ_ROTATE,), 50, 0.06),
+    "hard_drop": ((FREQ_HARD_DROP,), 100, 0.09),
+}
+
+def generate_tone(frequency, duration_ms, vol=0.1, sample_rate=MIXER_FREQUENCY):
+    """Stereo int16 PCM of one faded sine tone."""
+    num_samples = int(sample_rate * duration_ms / 1000.0)
+    buf = np.zeros((num_samples, 2), dtype=np.int16) # Stereo
+    max_sample = 2**(16 - 1) - 1
+
+    # Simple sine wave
+    t = np.linspace(0., duration_ms / 1000.0, num_samples)
+    wave = (vol * max_sample * np.sin(2. * np.pi * frequency * t)).astype(np.int16)
+
+    # Basic fade in/out to reduce clicks
+    fade_len = min(num_samples // 10, sample_rate // 100) # ~10ms fade max
+    if fade_len > 1:
+        fade_in = np.linspace(0., 1., fade_len)
+        fade_out = np.linspace(1., 0., fade_len)
+        wave[:fade_len] = (wave[:fade_len] * fade_in).astype(np.int16)
+        wave[-fade_len:] = (wave[-fade_len:] * fade_out).astype(np.int16)
+
+    buf[:, 0] = wave
+    buf[:, 1] = wave # Copy to right channel for stereo
+    return buf
+
+def generate_sequence(freq_list, duration_ms_per_note, vol=0.1, sample_rate=MIXER_FREQUENCY):
+    """Stereo int16 PCM of consecutive notes; a frequency <= 0 is a rest."""
+    num_samples_per_note = int(sample_rate * duration_ms_per_note / 1000.0)
+    total_samples = num_samples_per_note * len(freq_list)
+    buf = np.zeros((total_samples, 2), dtype=np.int16)
+    max_sample = 2**(16 - 1) - 1
+
+    for i, frequency in enumerate(freq_list):
+        if frequency <= 0: # Pause
+            continue
+        t = np.linspace(0., duration_ms_per_note / 1000.0, num_samples_per_note, endpoint=False)
+        chunk_mono = (vol * max_sample * np.sin(2. * np.pi * frequency * t)).astype(np.int16)
+
+        # Apply fade in/out to each note chunk
+        fade_len = min(num_samples_per_note // 10, sample_rate // 100)
         if fade_len > 1:
             fade_in = np.linspace(0., 1., fade_len)
             fade_out = np.linspace(1., 0., fade_len)
-            wave[:fade_len] = (wave[:fade_len] * fade_in).astype(np.int16)
-            wave[-fade_len:] = (wave[-fade_len:] * fade_out).astype(np.int16)
-
-        buf[:, 0] = wave
-        buf[:, 1] = wave # Copy to right channel for stereo
+            chunk_mono[:fade_len] = (chunk_mono[:fade_len] * fade_in).astype(np.int16)
+            chunk_mono[-fade_len:] = (chunk_mono[-fade_len:] * fade_out).astype(np.int16)
 
-        sound = pygame.sndarray.make_sound(buf)
-        sound_cache[sound_key] = sound
-        return sound
-    except Exception as e:
-        print(f"Error generating tone {frequency}Hz: {e}")
-        # Return dummy sound on error during generation
-        return pygame.mixer.Sound(buffer=np.array([[0,0]], dtype=np.int16))
+        start = i * num_samples_per_note
+        buf[start:start + num_samples_per_note] = chunk_mono[:, None] # Stereo
+    return buf
 
-def generate_sequence(freq_list, duration_ms_per_note, vol=0.1):
-    if not SOUND_ENABLED:
-        return pygame.mixer.Sound(buffer=np.array([[0,0]], dtype=np.int16))
+def sound_cache_path(freqs, duration_ms, vol, sample_rate):
+    name = "-".join(str(f) for f in freqs) + f"_{duration_ms}ms_v{vol}_{sample_rate}hz.pcm"
+    return os.path.join(SOUND_CACHE_DIR, name)
 
-    sound_key = (tuple(freq_list), duration_ms_per_note)
-    if sound_key in sound_cache:
-        return sound_cache[sound_key]
+def load_pcm(freqs, duration_ms, vol, sample_rate):
+    """PCM for one effect: memory-mapped from the disk cache, or synthesised and cached."""
+    path = sound_cache_path(freqs, duration_ms, vol, sample_rate)
+    try:
+        if os.path.getsize(path) > 0:
+            return np.memmap(path, dtype=np.int16, mode="r").reshape(-1, 2)
+    except (OSError, ValueError):
+        pass # Not cached yet (or unreadable), synthesise below
 
+    if len(freqs) == 1:
+        buf = generate_tone(freqs[0], duration_ms, vol, sample_rate)
+    else:
+        buf = generate_sequence(freqs, duration_ms, vol, sample_rate)
     try:
-        sample_rate = pygame.mixer.get_init()[0]
-        num_samples_per_note = int(sample_rate * duration_ms_per_note / 1000.0)
-        total_samples = num_samples_per_note * len(freq_list)
+        os.makedirs(SOUND_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        buf.tofile(tmp_path)
+        os.replace(tmp_path, path) # Another instance never sees a half-written file
+    except OSError as e:
+        print(f"Could not cache sound {os.path.basename(path)}: {e}")
+    return buf
+
+class SoundBank:
+    """Starts the mixer and loads SOUND_EFFECTS off the main thread; get() is None until ready."""
+
+    def __init__(self, effects=SOUND_EFFECTS):
+        self.effects = effects
+        self.sounds = {}
+        self.thread = None
+
+    def start(self):
+        if not NUMPY_AVAILABLE:
+            print("Sound disabled (Numpy missing).")
+            return
+        self.thread = threading.Thread(target=self.load, name="sound-bank", daemon=True)
+        try:
+            self.thread.start()
+        except RuntimeError: # No threads (e.g. Pyodide): load now instead
+            self.thread = None
+            self.load()
 
-        if total_samples == 0: # Avoid creating zero-length buffer
-             return pygame.mixer.Sound(buffer=np.array([[0,0]], dtype=np.int16))
+    def load(self):
+        global MIXER_INITIATED, SOUND_ENABLED
+        try:
+            pygame.mixer.init(frequency=MIXER_FREQUENCY, size=-16, channels=2, buffer=512) # Smaller buffer for less latency
+            MIXER_INITIATED = True
+        except pygame.error as e:
+            print(f"Warning: Pygame mixer could not be initiated: {e}. Sound disabled.")
+            return
+        SOUND_ENABLED = True
+        sample_rate = pygame.mixer.get_init()[0]
+        for name, (freqs, duration_ms, vol) in self.effects.items():
+            try:
+                self.sounds[name] = pygame.sndarray.make_sound(load_pcm(freqs, duration_ms, vol, sample_rate))
+            except Exception as e:
+                print(f"Error generating sound '{name}': {e}")
 
-        buf = np.zeros((total_samples, 2), dtype=np.int16)
-        max_sample = 2**(16 - 1) - 1
-        current_sample = 0
+    def get(self, name):
+        return self.sounds.get(name)
 
-        for frequency in freq_list:
-            if frequency <= 0: # Pause
-                chunk_mono = np.zeros(num_samples_per_note, dtype = np.int16)
-            else:
-                t = np.linspace(0., duration_ms_per_note / 1000.0, num_samples_per_note, endpoint=False)
-                chunk_mono = (vol * max_sample * np.sin(2. * np.pi * frequency * t)).astype(np.int16)
-
-            # Apply fade in/out to each note chunk
-            fade_len = min(num_samples_per_note // 10, sample_rate // 100)
-            if fade_len > 1 and frequency > 0: # Only fade actual notes
-                fade_in = np.linspace(0., 1., fade_len)
-                fade_out = np.linspace(1., 0., fade_len)
-                chunk_mono[:fade_len] = (chunk_mono[:fade_len] * fade_in).astype(np.int16)
-                chunk_mono[-fade_len:] = (chunk_mono[-fade_len:] * fade_out).astype(np.int16)
-
-            chunk = np.column_stack((chunk_mono, chunk_mono)) # Stereo
-            if current_sample + num_samples_per_note <= total_samples:
-                 buf[current_sample:current_sample + num_samples_per_note] = chunk
-            current_sample += num_samples_per_note
-
-
-        sound = pygame.sndarray.make_sound(buf)
-        sound_cache[sound_key] = sound
-        return sound
-
-    except Exception as e:
-        print(f"Error generating sequence starting {freq_list[0]}Hz: {e}")
-        return pygame.mixer.Sound(buffer=np.array([[0,0]], dtype=np.int16))
-
-# Pre-generate sounds if possible
-sound_land = None
-sound_clear = None
-sound_multi_clear = None
-sound_game_over = None
-sound_rotate = None
-sound_hard_drop = None
-
-if SOUND_ENABLED:
-    print("Attempting to generate sound effects...")
-    sound_land = generate_tone(FREQ_LAND, 75, vol=0.08)
-    sound_clear = generate_tone(FREQ_CLEAR, 150, vol=0.1)
-    sound_multi_clear = generate_tone(FREQ_MULTI_CLEAR, 250, vol=0.12)
-    sound_game_over = generate_sequence(FREQ_GAME_OVER, 300, vol=0.15)
-    sound_rotate = generate_tone(FREQ_ROTATE, 50, vol=0.06)
-    sound_hard_drop = generate_tone(FREQ_HARD_DROP, 100, vol=0.09)
-    print("Sound effects generated.")
-else:
-     print("Sound disabled (Numpy missing or Mixer init failed).")
+sound_bank = SoundBank()
 
 
 # --- Game State Variables ---
+# The rules live in TetrisSim; the front end mirrors its state here for drawing
+sim = None
 grid = None
 locked_blocks = {} # Initialize as empty dict
 current_piece = None
@@ -231,57 +282,252 @@ next_piece = None
 score = 0
 level = 1
 lines_cleared_total = 0
-fall_time = 0
-fall_speed = FALL_SPEED_INITIAL
 current_piece_y_float = 0.0 # For smooth falling animation
-last_fall_time = 0
-last_lock_time = 0
-landed = False # Is the current piece touching down?
+previous_piece = None # Falling piece and its y before the latest logic tick,
+previous_piece_y = 0.0 # used to interpolate between ticks when drawing
 
 game_state = "start" # "start", "playing", "paused", "game_over"
 game_over_start_time = 0
 last_score = 0
 score_update_time = 0
 
-# Movement control timers
-last_move_time = {"left": 0, "right": 0, "down": 0}
-move_key_held = {"left": False, "right": False, "down": False}
-das_triggered = {"left": False, "right": False}
-
-# Bag randomizer for pieces
-piece_bag = []
+# Keys currently held, as TetrisSim action bits
+input_held = 0
+input_pressed = 0 # Keys that went down since the last logic tick, even if already released
+autoplayer = None # AutoPlayer driving the game instead of the keyboard ('A' toggles)
+record_path = None # --record PATH: where each game is saved as a replay when it ends; off by default
+recording = None # Replay of the game in progress, saved to record_path when it ends
+playback = None # (action, dt) iterator while watching a replay instead of playing
+
+# --- Bitboard Playfield ---
+# Each row is one int with bit c set when column c is occupied. Every rotation
+# of every piece is precomputed as per-row bitmasks already shifted to each
+# legal column, so a collision test is at most four ANDs.
+FULL_ROW_MASK = (1 << GRID_COLS) - 1
+
+def build_piece_masks(shape):
+    """Returns one (placements, bottom_offset) entry per rotation of shape.
+
+    placements maps every in-bounds column x to a tuple of (row_offset, row_bits)
+    pairs; columns missing from the dict would put a cell off the side walls.
+    """
+    rotations = []
+    for cells in shape:
+        min_c = min(c for _, c in cells)
+        max_c = max(c for _, c in cells)
+        bottom = max(r for r, _ in cells)
+        row_bits = {}
+        for r_off, c_off in cells:
+            row_bits[r_off] = row_bits.get(r_off, 0) | (1 << c_off)
+        base = sorted(row_bits.items())
+
+        placements = {}
+        for x in range(-min_c, GRID_COLS - max_c):
+            placements[x] = tuple((r_off, bits << x if x >= 0 else bits >> -x) for r_off, bits in base)
+        rotations.append((placements, bottom))
+    return rotations
+
+# Keyed by id() of the shape table; pieces carry a reference to one of SHAPES
+piece_mask_cache = {id(shape): (shape, build_piece_masks(shape)) for shape in SHAPES}
+
+def get_piece_masks(shape):
+    entry = piece_mask_cache.get(id(shape))
+    if entry is None or entry[0] is not shape: # Unknown shape table, build on first use
+        entry = (shape, build_piece_masks(shape))
+        piece_mask_cache[id(shape)] = entry
+    return entry[1]
+
+class BitBoard:
+    """Playfield and locked-block store, indexed by row.
+
+    Each row keeps an occupancy bitmask (which doubles as its fill counter: a
+    row is full when it equals FULL_ROW_MASK, empty when it is 0) plus the
+    colour and glow of every cell, so line checks are O(1) per row and a clear
+    moves whole rows. Blocks locked above the screen wait in above until a
+    clear drops them in. Still indexable as grid_data[r][c] (the base colour or
+    GRID_BG_COLOR) so older code that probes cells keeps working. version is
+    bumped on every change so caches (the renderer, landing_y) can tell when
+    it moved on.
+    """
+    __slots__ = ("rows", "cells", "glows", "above", "version", "columns", "landings", "cache_version")
+
+    def __init__(self, locked_pos=None):
+        self.version = 0
+        self.cache_version = -1 # Version columns and landings were built for
+        self.rows = [0] * GRID_ROWS
+        self.cells = [[GRID_BG_COLOR] * GRID_COLS for _ in range(GRID_ROWS)]
+        self.glows = [[None] * GRID_COLS for _ in range(GRID_ROWS)]
+        self.above = {} # (r, c) -> (color, glow_color) for rows r < 0
+        if locked_pos:
+            for (r, c), (color, glow_color) in locked_pos.items():
+                if r < GRID_ROWS and 0 <= c < GRID_COLS:
+                    self.set_cell(r, c, color, glow_color)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Occupancy-only board for searches; cell colours are not tracked."""
+        board = cls.__new__(cls)
+        board.rows = rows
+        board.cells = None
+        board.glows = None
+        board.above = {}
+        board.version = 0
+        board.cache_version = -1
+        return board
+
+    @classmethod
+    def from_cells(cls, grid_data):
+        """Builds a board from a plain list-of-lists colour grid."""
+        board = cls()
+        for r, row in enumerate(grid_data[:GRID_ROWS]):
+            for c, color in enumerate(row[:GRID_COLS]):
+                if color != GRID_BG_COLOR:
+                    board.set_cell(r, c, color)
+        return board
+
+    def __getitem__(self, r):
+        return self.cells[r]
+
+    def __len__(self):
+        return GRID_ROWS
+
+    def set_cell(self, r, c, color, glow_color=None):
+        """Locks one block; returns True if that completed row r."""
+        self.version += 1
+        if r < 0:
+            self.above[(r, c)] = (color, glow_color)
+            return False
+        self.rows[r] |= 1 << c
+        self.cells[r][c] = color
+        self.glows[r][c] = glow_color if glow_color is not None else color
+        return self.rows[r] == FULL_ROW_MASK
+
+    def items(self):
+        """Snapshot of the visible locked blocks as ((r, c), (color, glow)) pairs.
+
+        Same shape as the old locked-position dict, so renderers can iterate it
+        directly; empty rows and empty cells are skipped via the row bitmasks.
+        """
+        for r, bits in enumerate(self.rows):
+            if not bits:
+                continue
+            cells = self.cells[r]
+            glows = self.glows[r]
+            while bits:
+                low = bits & -bits
+                c = low.bit_length() - 1
+                yield (r, c), (cells[c], glows[c])
+                bits ^= low
+
+    def topped_out(self):
+        """True if any locked block sits above the visible area."""
+        return bool(self.above)
+
+    def fits(self, shape, rotation, x, y):
+        """True if the piece fits at (x, y); rows above the top are always free."""
+        placements, bottom = get_piece_masks(shape)[rotation]
+        row_masks = placements.get(x)
+        if row_masks is None or y + bottom >= GRID_ROWS:
+            return False
+        rows = self.rows
+        for r_off, bits in row_masks:
+            r = y + r_off
+            if r >= 0 and rows[r] & bits:
+                return False
+        return True
+
+    def column_bits(self):
+        """Per-column occupancy, bit r set when row r is filled; rebuilt once per version."""
+        if self.cache_version != self.version:
+            columns = [0] * GRID_COLS
+            for r, bits in enumerate(self.rows):
+                while bits:
+                    low = bits & -bits
+                    columns[low.bit_length() - 1] |= 1 << r
+                    bits ^= low
+            self.columns = columns
+            self.landings = {}
+            self.cache_version = self.version
+        return self.columns
+
+    def landing_y(self, shape, rotation, x, y):
+        """Lowest y the piece reaches by dropping straight down from (x, y), where it must fit.
+
+        Each cell looks up the first filled row below it in its column, so
+        this is a handful of bit operations instead of a fits() per row. The
+        result is cached per (shape, rotation, x) until the board changes,
+        and reused for any y between the cached start and landing row, since
+        a falling piece cannot pass an obstacle.
+        """
+        columns = self.column_bits()
+        key = (id(shape), rotation, x)
+        cached = self.landings.get(key)
+        if cached is not None and cached[0] <= y <= cached[1]:
+            return cached[1]
+
+        distance = GRID_ROWS
+        for r_off, c_off in shape[rotation]:
+            below = y + r_off + 1 # First row under this cell
+            bits = columns[x + c_off] >> below if below >= 0 else columns[x + c_off] << -below
+            free = (bits & -bits).bit_length() - 1 if bits else GRID_ROWS - below
+            if free < distance:
+                distance = free
+        self.landings[key] = (y, y + distance)
+        return y + distance
+
+    def full_rows(self, candidates=None):
+        """Indices of completely filled rows, bottom to top.
+
+        Pass the rows a lock touched as candidates to skip scanning the board.
+        """
+        rows = self.rows
+        if candidates is None:
+            candidates = range(GRID_ROWS)
+        return sorted((r for r in set(candidates) if 0 <= r < GRID_ROWS and rows[r] == FULL_ROW_MASK), reverse=True)
+
+    def collapse(self, full=None):
+        """Removes the full rows in place, moving the rows above down. Returns the count.
+
+        Blocks waiting above the screen drop by the same count and land on the
+        board once they reach row 0.
+        """
+        if full is None:
+            full = self.full_rows()
+        cleared = len(full)
+        if not cleared:
+            return 0
+        gone = set(full)
+        keep = [r for r in range(GRID_ROWS) if r not in gone]
+        self.rows = [0] * cleared + [self.rows[r] for r in keep]
+        self.cells = [[GRID_BG_COLOR] * GRID_COLS for _ in range(cleared)] + [self.cells[r] for r in keep]
+        self.glows = [[None] * GRID_COLS for _ in range(cleared)] + [self.glows[r] for r in keep]
+        self.version += 1
+        if self.above:
+            waiting, self.above = self.above, {}
+            for (r, c), (color, glow_color) in waiting.items():
+                self.set_cell(r + cleared, c, color, glow_color)
+        return cleared
 
 # --- Helper Functions ---
 
 def create_grid(locked_pos={}):
-    g = [[GRID_BG_COLOR for _ in range(10)] for _ in range(20)]
-    for r in range(len(g)):
-        for c in range(len(g[r])):
-            if (r, c) in locked_pos:
-                g[r][c] = locked_pos[(r, c)][0] # Store base color
-    return g
-
-def get_shape():
-    global piece_bag
-    if not piece_bag:
-        piece_bag = list(range(len(SHAPES)))
-        random.shuffle(piece_bag)
-
-    shape_index = piece_bag.pop()
-    shape = SHAPES[shape_index]
+    return BitBoard(locked_pos)
+
+def make_piece(shape_index):
     color, glow_color = SHAPE_COLORS[shape_index]
     start_col = 10 // 2 - 2
 
     return {
         'x': start_col,
         'y': 0, # Start at row 0 (top)
-        'shape': shape,
+        'shape': SHAPES[shape_index],
         'color': color,
         'glow_color': glow_color,
         'rotation': 0
     }
 
-def draw_block(surface, color, glow_color, x, y, size, shadow=False):
+def render_block(surface, color, glow_color, x, y, size, shadow=False):
+    """Draws one block with primitives. Used to bake the sprite atlas, not per frame."""
     border_thickness = max(1, int(size * 0.08)) # Thinner border
     inner_size = size - border_thickness * 2
 
@@ -314,6 +560,77 @@ def draw_block(surface, color, glow_color, x, y, size, shadow=False):
     highlight_rect = pygame.Rect(inner_rect.left, inner_rect.top + inner_rect.height*0.4, inner_rect.width, inner_rect.height*0.6)
     pygame.draw.rect(surface, bottom_color, highlight_rect, border_radius=border_thickness//2)
 
+# --- Block Sprite Atlas ---
+# Blocks only ever come in the 7 SHAPE_COLORS, so every (colour, glow, size,
+# shadow) combination is baked once into a transparent sprite and blitted.
+PREVIEW_BLOCK_SIZE = BLOCK_SIZE * 0.8 # Next-piece preview draws slightly smaller blocks
+GHOST_COLOR = (80, 80, 80, 100) # Semi-transparent gray
+GHOST_BORDER_COLOR = (200, 200, 200, 120)
+
+block_sprites = {} # (color, glow_color, size, shadow) -> [(surface, (offset_x, offset_y)), ...]
+ghost_sprite = None
+
+def finish_sprite(sprite):
+    if pygame.display.get_surface() is not None:
+        sprite = sprite.convert_alpha() # Match the display format for fast blits
+    return sprite
+
+def build_block_sprite(color, glow_color, size, shadow=False):
+    """Renders a block as a list of (surface, offset) layers to blit in order.
+
+    The shadow is kept as its own layer: pre-compositing two translucent
+    surfaces onto one transparent sprite would not blend like the direct draw.
+    """
+    border_thickness = max(1, int(size * 0.08))
+    glow_radius = border_thickness + 1
+    pad = glow_radius // 2 # The glow reaches this far above/left of the block
+    sprite_size = pad + int(math.ceil(size + glow_radius - pad))
+
+    layers = []
+    if shadow:
+        shadow_offset = max(1, int(size * 0.1))
+        shadow_surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.rect(shadow_surf, (0, 0, 0, 70), (0, 0, size, size), border_radius=int(border_thickness * 1.5))
+        layers.append((finish_sprite(shadow_surf), (shadow_offset, shadow_offset)))
+
+    sprite = pygame.Surface((sprite_size, sprite_size), pygame.SRCALPHA)
+    render_block(sprite, color, glow_color, pad, pad, size)
+    layers.append((finish_sprite(sprite), (-pad, -pad)))
+    return layers
+
+def build_ghost_sprite():
+    sprite = pygame.Surface((BLOCK_SIZE, BLOCK_SIZE), pygame.SRCALPHA)
+    pygame.draw.rect(sprite, GHOST_COLOR, (0, 0, BLOCK_SIZE, BLOCK_SIZE), border_radius=2)
+    pygame.draw.rect(sprite, GHOST_BORDER_COLOR, (1, 1, BLOCK_SIZE-2, BLOCK_SIZE-2), 1, border_radius=2) # Thin border
+    return finish_sprite(sprite)
+
+def build_sprite_atlas():
+    """Pre-renders every block variant the game draws. Call once after the display exists."""
+    global ghost_sprite
+    block_sprites.clear()
+    for color, glow_color in SHAPE_COLORS:
+        for size, shadow in ((BLOCK_SIZE, False), (BLOCK_SIZE, True), (PREVIEW_BLOCK_SIZE, False)):
+            block_sprites[(color, glow_color, size, shadow)] = build_block_sprite(color, glow_color, size, shadow)
+    ghost_sprite = build_ghost_sprite()
+
+def draw_block(surface, color, glow_color, x, y, size, shadow=False):
+    key = (color, glow_color, size, shadow)
+    layers = block_sprites.get(key)
+    if layers is None: # Variant not in the atlas yet, bake it on first use
+        layers = build_block_sprite(color, glow_color, size, shadow)
+        block_sprites[key] = layers
+    dirty = None
+    for sprite, (off_x, off_y) in layers:
+        rect = surface.blit(sprite, (x + off_x, y + off_y))
+        dirty = rect if dirty is None else dirty.union(rect)
+    return dirty # Screen area touched, for dirty-rect updates
+
+def draw_ghost_block(surface, x, y):
+    global ghost_sprite
+    if ghost_sprite is None:
+        ghost_sprite = build_ghost_sprite()
+    return surface.blit(ghost_sprite, (x, y))
+
 def get_formatted_shape(piece):
     positions = []
     if not piece or not piece.get('shape'): # Safety check
@@ -324,83 +641,918 @@ def get_formatted_shape(piece):
     return positions
 
 def is_valid_position(piece, grid_data, adj_x=0, adj_y=0, adj_rot=0):
-    if piece is None: return False # Safety check
-    
-    potential_piece = piece.copy()
-    potential_piece['x'] += adj_x
-    potential_piece['y'] += adj_y
-    # Ensure 'shape' key exists before accessing length
-    if 'shape' in piece:
-        potential_piece['rotation'] = (piece.get('rotation', 0) + adj_rot) % len(piece['shape'])
-    else:
-        return False # Cannot validate if shape is missing
-
-    formatted = get_formatted_shape(potential_piece)
-    if not formatted: return False # If shape was invalid
-
-    for r, c in formatted:
-        # Check bounds strictly
-        if not (0 <= c < 10): return False
-        if not (0 <= r < 20): # Check if below grid first
-             if r >= 20 : return False # Strictly cannot be below line 20
-             if r < 0: # Allow pieces partially above the screen during rotation/spawn? Yes.
-                 pass # Valid to be temporarily above grid
-
-        # Check collision with locked blocks (only for rows >= 0)
-        if r >= 0:
-             try:
-                # Check if cell exists before accessing
-                 if grid_data[r][c] != GRID_BG_COLOR:
-                    return False # Collision
-             except IndexError:
-                 print(f"Warning: Grid index out of range access: r={r}, c={c}")
-                 return False # Treat index error as invalid
-
-    return True
+    if piece is None or not piece.get('shape'): return False # Safety check
+
+    if not isinstance(grid_data, BitBoard): # Plain colour grid from older callers
+        grid_data = BitBoard.from_cells(grid_data)
+
+    shape = piece['shape']
+    rotation = (piece.get('rotation', 0) + adj_rot) % len(shape)
+    # Rows above the screen (r < 0) are allowed during rotation/spawn
+    return grid_data.fits(shape, rotation, piece['x'] + adj_x, piece['y'] + adj_y)
 
 def check_lost(locked_pos):
+    if isinstance(locked_pos, BitBoard):
+        return locked_pos.topped_out()
     for r, c in locked_pos:
         if r < 0: # Check if any part locked above visible area
             return True # Standard Tetris loses if piece locks and overlaps spawn area (usually r=0 or 1)
     return False
 
-def clear_lines(grid_data, locked_pos):
-    lines_to_clear = []
-    for r in range(19, -1, -1):
-        is_full = all(grid_data[r][c] != GRID_BG_COLOR for c in range(10))
-        if is_full:
-            lines_to_clear.append(r)
-
-    num_cleared = len(lines_to_clear)
-
-    if num_cleared > 0:
-        if SOUND_ENABLED:
-            try:
-                if num_cleared >= 4: sound_multi_clear.play()
-                else: sound_clear.play()
-            except AttributeError: pass # Ignore if sound obj is None
-
-        lines_to_clear_set = set(lines_to_clear)
-        cleared_rows_sorted = sorted(list(lines_to_clear_set), reverse=True)
-
-        # More robust way to create new locked_pos by shifting down
-        new_locked = {}
-        for r, c in sorted(locked_pos.keys()): # Iterate sorted by row
-             if r not in lines_to_clear_set:
-                 shift_amount = sum(1 for cleared_r in cleared_rows_sorted if r < cleared_r)
-                 new_locked[(r + shift_amount, c)] = locked_pos[(r, c)]
-
-        return num_cleared, new_locked
-    else:
-        return 0, locked_pos
+def clear_lines(grid_data, touched_rows=None):
+    """Collapses the full rows of a BitBoard in place and returns how many were cleared.
+
+    touched_rows limits the line check to the rows the last lock wrote to.
+    """
+    if not isinstance(grid_data, BitBoard):
+        grid_data = BitBoard.from_cells(grid_data)
+    return grid_data.collapse(grid_data.full_rows(touched_rows))
+
+# --- Simulation Core ---
+# TetrisSim holds all game rules and state with no pygame dependency and no
+# wall-clock reads: time only advances through step(action, dt), and pieces
+# come from a seeded 7-bag, so the same seed and action stream always replay
+# the same game. The pygame front end below just feeds it keyboard state.
+
+# Action bits for TetrisSim.step(): buttons held down during the step
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_DOWN = 4
+ACTION_ROTATE = 8
+ACTION_HARD_DROP = 16
+
+MAX_STEP_DT = 0.2 # Clamp a single step to prevent huge jumps after pause/lag
+
+def level_fall_speed(level):
+    return max(0.03, FALL_SPEED_INITIAL * (FALL_SPEED_LEVEL_MULTIPLIER ** (level - 1)))
+
+class TetrisSim:
+    """Headless, deterministic Tetris: 7-bag, DAS/ARR, lock delay, gravity levels, scoring.
+
+    step(action, dt) advances the game by dt seconds with the given action bits
+    held. Rotate, hard drop and the first shift/soft-drop fire on the step a
+    button goes down; held LEFT/RIGHT repeat via DAS/ARR and held DOWN switches
+    to FALL_SPEED_FAST. Sound-worthy moments are reported in self.events
+    ("rotate", "hard_drop", "land", "clear", "multi_clear", "game_over").
+    """
+
+    def __init__(self, seed=None, start_level=1):
+        self.rng = random.Random()
+        self.reset(seed, start_level)
+
+    def reset(self, seed=None, start_level=1):
+        self.seed = seed
+        self.start_level = start_level
+        self.rng.seed(seed)
+        self.bag = []
+        self.board = BitBoard() # Collision rows and locked block colours in one store
+        self.current = self.next_piece()
+        self.next = self.next_piece()
+        self.piece_y_float = 0.0
+        self.score = 0
+        self.level = start_level # Stays here until the cleared lines catch up
+        self.lines = 0
+        self.fall_time = 0
+        self.fall_speed = level_fall_speed(start_level)
+        self.time = 0.0 # Simulated seconds since reset
+        self.last_lock_time = 0
+        self.landed = False # Is the current piece touching down?
+        self.game_over = False
+        self.held = 0
+        self.last_move_time = {ACTION_LEFT: 0, ACTION_RIGHT: 0, ACTION_DOWN: 0}
+        self.das_triggered = {ACTION_LEFT: False, ACTION_RIGHT: False}
+        self.events = []
+
+    def next_piece(self):
+        """Draws from the bag randomizer, refilling it with all seven shapes when empty."""
+        if not self.bag:
+            self.bag = list(range(len(SHAPES)))
+            self.rng.shuffle(self.bag)
+        return make_piece(self.bag.pop())
+
+    def fits(self, piece, adj_x=0, adj_y=0, adj_rot=0):
+        shape = piece['shape']
+        return self.board.fits(shape, (piece['rotation'] + adj_rot) % len(shape), piece['x'] + adj_x, piece['y'] + adj_y)
+
+    def drop_distance(self, piece):
+        """Rows the piece can still fall; 0 means it is touching down."""
+        shape = piece['shape']
+        return self.board.landing_y(shape, piece['rotation'] % len(shape), piece['x'], piece['y']) - piece['y']
+
+    def step(self, action=0, dt=1 / 60):
+        """Advances the game by dt seconds with the given action bits held."""
+        self.events = []
+        if self.game_over:
+            return
+        self.time += dt
+        fall_speed = self.apply_input(action)
+        self.update(min(dt, MAX_STEP_DT), fall_speed)
+
+    def apply_input(self, action):
+        """Handles button presses and DAS/ARR; returns the fall speed to use this step."""
+        now = self.time
+        piece = self.current
+        pressed = action & ~self.held
+        self.held = action
+        modified = False # Track if piece position/rotation changed by input
+
+        if pressed & ACTION_ROTATE: # Rotate Clockwise
+            if self.fits(piece, adj_rot=1):
+                piece['rotation'] = (piece['rotation'] + 1) % len(piece['shape'])
+                self.events.append("rotate")
+                modified = True
+        if pressed & ACTION_HARD_DROP:
+            drop_amount = self.drop_distance(piece)
+            if drop_amount > 0:
+                piece['y'] += drop_amount
+                self.piece_y_float = float(piece['y']) # Snap float pos
+                self.score += drop_amount * SCORE_HARD_DROP_BONUS
+                modified = True
+                # Force immediate lock check on next logic update
+                self.landed = True
+                self.fall_time = self.fall_speed + LOCK_DELAY + 0.1
+                self.events.append("hard_drop")
+        for bit, direction in ((ACTION_LEFT, -1), (ACTION_RIGHT, 1)):
+            if pressed & bit:
+                self.das_triggered[bit] = False
+                self.last_move_time[bit] = now # Record initial press time
+                if self.fits(piece, adj_x=direction):
+                    piece['x'] += direction
+                    modified = True
+        if pressed & ACTION_DOWN:
+            self.last_move_time[ACTION_DOWN] = now
+            if self.drop_distance(piece): # Move down one step immediately on press for responsiveness
+                piece['y'] += 1
+                self.piece_y_float = float(piece['y'])
+                self.score += SCORE_SOFT_DROP_BONUS
+                self.fall_time = 0 # Reset fall timer after manual move
+                modified = True
+
+        # Continuous horizontal movement (DAS/ARR)
+        for bit, direction in ((ACTION_LEFT, -1), (ACTION_RIGHT, 1)):
+            if action & bit and not pressed & bit:
+                elapsed_since_last = now - self.last_move_time[bit]
+                # Check DAS first (only trigger DAS movement after delay)
+                if not self.das_triggered[bit] and elapsed_since_last >= DAS_DELAY:
+                    self.das_triggered[bit] = True
+                # Then check ARR (only trigger repeats if DAS is active and ARR time passed)
+                elif not (self.das_triggered[bit] and elapsed_since_last >= ARR_DELAY):
+                    continue
+                self.last_move_time[bit] = now # Reset timer for next repeat
+                if self.fits(piece, adj_x=direction):
+                    piece['x'] += direction
+                    modified = True
+
+        # Moving or rotating a piece that rests on something restarts the lock delay
+        if modified and not self.drop_distance(piece):
+            self.last_lock_time = now
+
+        return FALL_SPEED_FAST if action & ACTION_DOWN else self.fall_speed
+
+    def update(self, delta_time, fall_speed):
+        """Gravity, lock delay, locking, line clears and spawning."""
+        now = self.time
+        piece = self.current
+        is_touching_down = not self.drop_distance(piece)
+
+        # --- Handle Locking ---
+        if self.landed:
+            if is_touching_down:
+                if now - self.last_lock_time >= LOCK_DELAY:
+                    self.lock_piece()
+                    return
+            else: # Was landed, but moved/rotated off the ledge
+                self.landed = False
+                self.fall_time = 0
+
+        # --- Handle Falling ---
+        if not self.landed:
+            self.fall_time += delta_time
+            potential_grid_steps = self.fall_time / fall_speed
+
+            if potential_grid_steps >= 1.0: # Try to move down integer steps
+                wanted_steps = int(potential_grid_steps)
+                moved_steps = min(wanted_steps, self.drop_distance(piece))
+                can_move_further = moved_steps == wanted_steps # False if it hit something
+                piece['y'] += moved_steps
+                if self.held & ACTION_DOWN and fall_speed == FALL_SPEED_FAST:
+                    self.score += moved_steps * SCORE_SOFT_DROP_BONUS
+
+                # Adjust accumulated fall time based on steps actually taken
+                self.fall_time = max(0, self.fall_time - moved_steps * fall_speed)
+
+                if not can_move_further:
+                    self.landed = True
+                    self.last_lock_time = now # Start lock timer
+                    self.events.append("land")
+
+                # Always sync float Y to integer Y after grid step movements
+                self.piece_y_float = float(piece['y'])
+            else:
+                # No full grid step occurred, interpolate within the current step
+                self.piece_y_float = float(piece['y']) + potential_grid_steps
+
+            # Even if we didn't process steps this frame, re-check if now landed
+            if not self.landed and not self.drop_distance(piece):
+                self.landed = True
+                self.last_lock_time = now
+
+    def lock_piece(self):
+        piece = self.current
+        shape = piece['shape']
+        touched = []
+        for r, c in shape[piece['rotation'] % len(shape)]:
+            r += piece['y']
+            if self.board.set_cell(r, c + piece['x'], piece['color'], piece['glow_color']):
+                touched.append(r) # Only rows this lock completed need checking
+
+        num_cleared = clear_lines(self.board, touched)
+        if num_cleared > 0:
+            self.events.append("multi_clear" if num_cleared >= 4 else "clear")
+            self.score += SCORE_PER_LINE[min(num_cleared, len(SCORE_PER_LINE)-1)] * self.level
+            self.lines += num_cleared
+            new_level = (self.lines // LINES_PER_LEVEL) + 1
+            if new_level > self.level:
+                self.level = new_level
+                self.fall_speed = level_fall_speed(self.level)
+
+        if check_lost(self.board): # Locked pieces poke above the visible area
+            self.end_game()
+            return
+
+        # --- Spawn New Piece ---
+        self.current = self.next
+        self.next = self.next_piece()
+        self.piece_y_float = 0.0
+        self.fall_time = 0
+        self.landed = False
+        if not self.fits(self.current): # New piece spawns in an occupied spot
+            self.end_game()
+
+    def end_game(self):
+        self.game_over = True
+        self.events.append("game_over")
+
+def run_headless(num_games=100, seed=0, dt=1 / 60, max_steps=100000, player=None, start_level=1):
+    """Plays games without a display; returns (games, steps, seconds).
+
+    Inputs are random unless a player with think(sim) and next_action(sim)
+    (AutoPlayer) is given; it thinks once per step.
+    """
+    rng = random.Random(seed)
+    sim = TetrisSim()
+    total_steps = 0
+    start = time.perf_counter()
+    for game in range(num_games):
+        sim.reset(seed + game, start_level)
+        if player is not None:
+            player.reset()
+        action = 0
+        for _ in range(max_steps):
+            if player is not None:
+                player.think(sim)
+                action = player.next_action(sim)
+            elif rng.random() < 0.1:
+                action = rng.randrange(32)
+            sim.step(action, dt)
+            total_steps += 1
+            if sim.game_over:
+                break
+    return num_games, total_steps, time.perf_counter() - start
+
+# --- Replays ---
+# A replay is everything TetrisSim needs to re-run a game bit for bit: the
+# bag seed, the start level, every step's dt and the action bits. Step times
+# are stored in whole microseconds as zigzag varint deltas (a steady 60 FPS
+# frame costs one byte) and actions only when they change, as (frame gap,
+# bits) varint pairs. A CRC of the final state catches desyncs on playback.
+REPLAY_MAGIC = b"TTRP"
+REPLAY_VERSION = 1
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("truncated replay")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+def sim_checksum(sim):
+    state = [sim.score, sim.lines, sim.level, int(sim.game_over)] + list(sim.board.rows)
+    return zlib.crc32(",".join(map(str, state)).encode())
+
+class Replay:
+    """Seed, start level, per-step dt (microseconds) and action changes of one game."""
+
+    def __init__(self, seed, start_level=1):
+        self.seed = seed
+        self.start_level = start_level
+        self.step_times = [] # Microseconds per step
+        self.changes = [] # (step index, action bits) whenever the action changes
+        self.last_action = 0
+        self.checksum = None
+
+    def record(self, action, dt):
+        """Logs one step and returns dt rounded the way playback will see it.
+
+        The live game must step with the returned value, or the replay drifts.
+        """
+        dt_us = max(0, round(dt * 1e6))
+        if action != self.last_action:
+            self.changes.append((len(self.step_times), action))
+            self.last_action = action
+        self.step_times.append(dt_us)
+        return dt_us / 1e6
+
+    def finish(self, sim):
+        self.checksum = sim_checksum(sim)
+
+    def steps(self):
+        """Yields (action, dt) for every recorded step."""
+        changes = iter(self.changes)
+        next_change = next(changes, None)
+        action = 0
+        for index, dt_us in enumerate(self.step_times):
+            if next_change is not None and next_change[0] == index:
+                action = next_change[1]
+                next_change = next(changes, None)
+            yield action, dt_us / 1e6
+
+    def encode(self):
+        out = bytearray(REPLAY_MAGIC)
+        write_varint(out, REPLAY_VERSION)
+        write_varint(out, self.seed)
+        write_varint(out, self.start_level)
+        write_varint(out, self.checksum if self.checksum is not None else 0)
+        write_varint(out, len(self.step_times))
+        previous = 0
+        for dt_us in self.step_times:
+            write_varint(out, zigzag(dt_us - previous))
+            previous = dt_us
+        write_varint(out, len(self.changes))
+        previous = 0
+        for index, action in self.changes:
+            write_varint(out, index - previous)
+            write_varint(out, action)
+            previous = index
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data):
+        if data[:len(REPLAY_MAGIC)] != REPLAY_MAGIC:
+            raise ValueError("Not a Tetris replay")
+        pos = len(REPLAY_MAGIC)
+        version, pos = read_varint(data, pos)
+        if version != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        seed, pos = read_varint(data, pos)
+        start_level, pos = read_varint(data, pos)
+        replay = cls(seed, start_level)
+        replay.checksum, pos = read_varint(data, pos)
+
+        count, pos = read_varint(data, pos)
+        dt_us = 0
+        for _ in range(count):
+            delta, pos = read_varint(data, pos)
+            dt_us += unzigzag(delta)
+            replay.step_times.append(dt_us)
+        count, pos = read_varint(data, pos)
+        index = 0
+        for _ in range(count):
+            gap, pos = read_varint(data, pos)
+            action, pos = read_varint(data, pos)
+            index += gap
+            replay.changes.append((index, action))
+        return replay
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.decode(f.read())
+
+    def verify(self):
+        """Re-runs the game headless and unthrottled; returns (sim, checksum matches)."""
+        sim = TetrisSim(self.seed, self.start_level)
+        for action, dt in self.steps():
+            sim.step(action, dt)
+        return sim, sim_checksum(sim) == self.checksum
+
+# --- Batch Simulation (NumPy) ---
+# BatchTetris advances N independent games at once, one piece placement per
+# call. Boards are an (N, GRID_ROWS) array of row bitmasks, so legality tests,
+# landing heights and line clears run as whole-array operations. Placement
+# mode skips gravity and input timing: a move is (rotation, column), dropped
+# straight down from the spawn row, which is what heuristic tuning needs.
+BATCH_X_OFFSET = 3 # Pieces can sit up to 3 columns left of the wall (x = -3)
+BATCH_X_SLOTS = GRID_COLS + BATCH_X_OFFSET
+BATCH_ROTATIONS = 4
+BAG_SIZE = len(SHAPES)
+
+def build_batch_tables():
+    """(masks, legal) lookup arrays indexed by [shape, rotation, x + BATCH_X_OFFSET].
+
+    masks holds the four row bitmasks of each placement (zero rows included),
+    legal is False where the rotation does not exist or a cell leaves the walls.
+    """
+    masks = np.zeros((len(SHAPES), BATCH_ROTATIONS, BATCH_X_SLOTS, 4), dtype=np.uint16)
+    legal = np.zeros((len(SHAPES), BATCH_ROTATIONS, BATCH_X_SLOTS), dtype=bool)
+    for s, shape in enumerate(SHAPES):
+        for rot, (placements, _bottom) in enumerate(build_piece_masks(shape)):
+            for x, row_masks in placements.items():
+                legal[s, rot, x + BATCH_X_OFFSET] = True
+                for r_off, bits in row_masks:
+                    masks[s, rot, x + BATCH_X_OFFSET, r_off] = bits
+    return masks, legal
+
+batch_tables = None
+
+def get_batch_tables():
+    global batch_tables
+    if batch_tables is None:
+        batch_tables = build_batch_tables()
+    return batch_tables
+
+class BatchTetris:
+    """N independent placement-mode Tetris games stepped together.
+
+    Scoring follows SCORE_PER_LINE times the level, with a level every
+    LINES_PER_LEVEL lines. A game ends when its chosen placement is illegal,
+    so callers should pick from legal_placements().
+    """
+
+    def __init__(self, num_games, seed=None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("BatchTetris needs numpy")
+        self.num_games = num_games
+        self.rng = np.random.default_rng(seed)
+        self.masks, self.legal_table = get_batch_tables()
+        self.reset()
+
+    def reset(self):
+        n = self.num_games
+        self.boards = np.zeros((n, GRID_ROWS), dtype=np.uint16)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.bag = np.zeros((n, BAG_SIZE), dtype=np.int8)
+        self.bag_pos = np.full(n, BAG_SIZE, dtype=np.int8) # Empty bags, filled on first draw
+        self.current = self.draw_pieces()
+        self.next = self.draw_pieces()
+
+    def draw_pieces(self):
+        """Batched 7-bag: one shape index per game, refilling exhausted bags."""
+        empty = self.bag_pos >= BAG_SIZE
+        if empty.any():
+            count = int(empty.sum())
+            self.bag[empty] = np.argsort(self.rng.random((count, BAG_SIZE)), axis=1)
+            self.bag_pos[empty] = 0
+        drawn = self.bag[np.arange(self.num_games), self.bag_pos].astype(np.intp)
+        self.bag_pos += 1
+        return drawn
+
+    def padded_boards(self, boards):
+        """Boards with four solid rows under the floor, so every drop ends in a collision."""
+        floor = np.full(boards.shape[:-1] + (4,), FULL_ROW_MASK, dtype=np.uint16)
+        return np.concatenate([boards, floor], axis=-1)
+
+    def drop_heights(self, masks):
+        """Landing row for each placement mask, or -1 where it does not fit at spawn.
+
+        masks has shape (N, ..., 4); every candidate top row 0..GRID_ROWS is
+        tested at once and the first colliding row gives the landing spot.
+        """
+        windows = np.arange(GRID_ROWS + 1)[:, None] + np.arange(4) # (Y, 4) row indices
+        rows = self.padded_boards(self.boards)[:, windows] # (N, Y, 4)
+        extra = masks.ndim - 2
+        rows = rows.reshape((rows.shape[0],) + (1,) * extra + rows.shape[1:])
+        collide = (rows & masks[..., None, :]).any(axis=-1) # (N, ..., Y)
+        return collide.argmax(axis=-1) - 1
+
+    def legal_placements(self):
+        """Bool array (N, 4, BATCH_X_SLOTS): which (rotation, x + BATCH_X_OFFSET) can be played."""
+        masks = self.masks[self.current] # (N, 4, X, 4)
+        legal = self.legal_table[self.current] & (self.drop_heights(masks) >= 0)
+        legal[self.done] = False
+        return legal
+
+    def apply_placements(self, boards, masks, landing):
+        """ORs placement masks into copies of boards; returns (boards, lines cleared)."""
+        new = self.padded_boards(boards)
+        lead = np.indices(landing.shape)
+        rows = landing[..., None] + np.arange(4)
+        idx = tuple(i[..., None] for i in lead) + (np.clip(rows, 0, GRID_ROWS + 3),)
+        np.bitwise_or.at(new, idx, np.where(landing[..., None] >= 0, masks, 0))
+        new = new[..., :GRID_ROWS]
+        return self.collapse(new)
+
+    def collapse(self, boards):
+        """Batched line clear: full rows are dropped and empty rows pushed in on top."""
+        full = boards == FULL_ROW_MASK
+        cleared = full.sum(axis=-1)
+        if cleared.any():
+            order = np.argsort(~full, axis=-1, kind="stable") # Full rows first, rest keep their order
+            boards = np.take_along_axis(boards, order, axis=-1)
+            boards[np.arange(GRID_ROWS) < cleared[..., None]] = 0
+        return boards, cleared
+
+    def place(self, rotation, x):
+        """Drops every game's current piece at (rotation, x); returns lines cleared per game."""
+        active = ~self.done
+        rotation = np.asarray(rotation, dtype=np.intp) % BATCH_ROTATIONS
+        slot = np.clip(np.asarray(x, dtype=np.intp) + BATCH_X_OFFSET, 0, BATCH_X_SLOTS - 1)
+        slot_ok = (np.asarray(x) + BATCH_X_OFFSET >= 0) & (np.asarray(x) + BATCH_X_OFFSET < BATCH_X_SLOTS)
+
+        masks = self.masks[self.current, rotation, slot] # (N, 4)
+        landing = self.drop_heights(masks)
+        ok = active & slot_ok & self.legal_table[self.current, rotation, slot] & (landing >= 0)
+        self.done |= active & ~ok
+
+        boards, cleared = self.apply_placements(self.boards, masks, np.where(ok, landing, -1))
+        self.boards = np.where(ok[:, None], boards, self.boards)
+        cleared = np.where(ok, cleared, 0)
+
+        level = self.lines // LINES_PER_LEVEL + 1
+        self.score += np.asarray(SCORE_PER_LINE)[np.minimum(cleared, len(SCORE_PER_LINE) - 1)] * level
+        self.lines += cleared
+        self.pieces += ok
+
+        drawn = self.draw_pieces()
+        self.current = np.where(ok, self.next, self.current)
+        self.next = np.where(ok, drawn, self.next)
+        # The next piece must fit at its spawn position, as in TetrisSim
+        spawn_masks = self.masks[self.current, 0, 10 // 2 - 2 + BATCH_X_OFFSET]
+        self.done |= ok & (self.boards[:, :4] & spawn_masks).any(axis=1)
+        return cleared
+
+    def evaluate_placements(self, weights):
+        """Scores every placement of the current piece with a linear board evaluator.
+
+        weights = (aggregate height, holes, bumpiness, lines cleared). Returns
+        (N, 4, BATCH_X_SLOTS) float scores with -inf for illegal placements.
+        """
+        masks = self.masks[self.current] # (N, 4, X, 4)
+        landing = self.drop_heights(masks)
+        legal = self.legal_table[self.current] & (landing >= 0) & ~self.done[:, None, None]
+        boards = np.broadcast_to(self.boards[:, None, None, :], masks.shape[:3] + (GRID_ROWS,))
+        boards, cleared = self.apply_placements(boards, masks, np.where(legal, landing, -1))
+
+        cells = (boards[..., None] >> np.arange(GRID_COLS, dtype=np.uint16)) & 1 # (N, 4, X, ROWS, COLS)
+        occupied = cells.astype(bool)
+        top = np.where(occupied.any(axis=-2), occupied.argmax(axis=-2), GRID_ROWS)
+        heights = GRID_ROWS - top # (N, 4, X, COLS)
+        holes = heights.sum(axis=-1) - occupied.sum(axis=(-2, -1))
+        bumpiness = np.abs(np.diff(heights, axis=-1)).sum(axis=-1)
+
+        w_height, w_holes, w_bump, w_lines = weights
+        scores = w_height * heights.sum(axis=-1) + w_holes * holes + w_bump * bumpiness + w_lines * cleared
+        return np.where(legal, scores, -np.inf)
+
+    def play_greedy(self, weights, max_pieces=500):
+        """Plays every game with the best-scoring placement until all are done or max_pieces."""
+        for _ in range(max_pieces):
+            if self.done.all():
+                break
+            scores = self.evaluate_placements(weights).reshape(self.num_games, -1)
+            best = scores.argmax(axis=1)
+            rotation, slot = np.divmod(best, BATCH_X_SLOTS)
+            self.place(rotation, slot - BATCH_X_OFFSET)
+
+DEFAULT_WEIGHTS = (-0.51, -0.36, -0.18, 0.76) # Height, holes, bumpiness, lines
+
+def run_batch(args):
+    """Process-pool worker: plays one batch and returns (games, placements, lines, score)."""
+    num_games, seed, weights, max_pieces = args
+    batch = BatchTetris(num_games, seed)
+    batch.play_greedy(weights, max_pieces)
+    return num_games, int(batch.pieces.sum()), int(batch.lines.sum()), int(batch.score.sum())
+
+def run_batch_pool(total_games=256, batch_size=128, weights=DEFAULT_WEIGHTS, max_pieces=200, seed=0, workers=None):
+    """Spreads batches across a process pool (one worker per core by default).
+
+    Returns (games, placements, lines, score, seconds) summed over all batches.
+    """
+    jobs = []
+    for i, start in enumerate(range(0, total_games, batch_size)):
+        jobs.append((min(batch_size, total_games - start), seed + i, tuple(weights), max_pieces))
+
+    begin = time.perf_counter()
+    totals = [0, 0, 0, 0]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for result in pool.map(run_batch, jobs):
+            totals = [t + r for t, r in zip(totals, result)]
+    return tuple(totals) + (time.perf_counter() - begin,)
+
+# --- Autoplay AI ---
+# AutoPlayer searches every reachable final placement of the current piece,
+# expands the best few with every placement of the next piece, and then plays
+# the chosen path by returning action bits, exactly like the keyboard does.
+# The search is a generator that the game loop advances once per rendered
+# frame, for at most think_budget seconds, so the game keeps drawing at full
+# rate while the AI thinks. Logic ticks only follow a finished plan.
+AI_BEAM_WIDTH = 6 # First-piece placements expanded with the next piece
+AI_THINK_BUDGET = 0.008 # Seconds of search per rendered frame, however many logic ticks it runs
+AI_CACHE_LIMIT = 200000 # Board evaluations kept in the transposition cache
+
+def evaluate_rows(rows, lines_cleared, weights=DEFAULT_WEIGHTS):
+    """Default board evaluator: weighted aggregate height, holes, bumpiness and lines."""
+    heights = [0] * GRID_COLS
+    seen = 0 # Columns that have a block at or above the current row
+    holes = 0
+    for r, bits in enumerate(rows):
+        new = bits & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = GRID_ROWS - r
+            new ^= low
+        seen |= bits
+        holes += bin(seen & ~bits).count("1")
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+
+    w_height, w_holes, w_bump, w_lines = weights
+    return w_height * sum(heights) + w_holes * holes + w_bump * bumpiness + w_lines * lines_cleared
+
+def find_placements(board, shape, start):
+    """BFS over (rotation, x, y) states reachable with shift, rotate and soft drop.
+
+    Returns (finals, parents): the resting states, and the parent links to
+    rebuild the move path to any of them.
+    """
+    if not board.fits(shape, *start):
+        return [], {}
+    num_rotations = len(shape)
+    parents = {start: None}
+    queue = deque([start])
+    finals = []
+    while queue:
+        state = queue.popleft()
+        rot, x, y = state
+        for nxt in ((rot, x - 1, y), (rot, x + 1, y), ((rot + 1) % num_rotations, x, y), (rot, x, y + 1)):
+            if nxt not in parents and board.fits(shape, *nxt):
+                parents[nxt] = state
+                queue.append(nxt)
+        if (rot, x, y + 1) not in parents:
+            finals.append(state)
+    return finals, parents
+
+def lock_rows(rows, shape, state):
+    """Rows after locking shape at state and clearing lines, or (None, 0) on a top-out."""
+    rot, x, y = state
+    new_rows = list(rows)
+    for r_off, bits in get_piece_masks(shape)[rot][0][x]:
+        if y + r_off < 0:
+            return None, 0
+        new_rows[y + r_off] |= bits
+    kept = [bits for bits in new_rows if bits != FULL_ROW_MASK]
+    cleared = GRID_ROWS - len(kept)
+    return tuple([0] * cleared + kept), cleared
+
+class AutoPlayer:
+    """Plays TetrisSim through action bits, one planned placement per piece."""
+
+    def __init__(self, evaluator=evaluate_rows, beam_width=AI_BEAM_WIDTH, think_budget=AI_THINK_BUDGET):
+        self.evaluator = evaluator
+        self.beam_width = beam_width
+        self.think_budget = think_budget
+        self.cache = {} # (rows, lines cleared) -> evaluation, shared across moves
+        self.reset()
+
+    def reset(self):
+        self.piece = None # Piece dict the current plan was made for
+        self.search = None
+        self.plan = None # Remaining (rotation, x, y) waypoints
+        self.last_action = 0
+
+    def evaluate(self, rows, lines_cleared):
+        key = (rows, lines_cleared)
+        score = self.cache.get(key)
+        if score is None:
+            if len(self.cache) >= AI_CACHE_LIMIT:
+                self.cache.clear()
+            score = self.evaluator(rows, lines_cleared)
+            self.cache[key] = score
+        return score
+
+    def search_moves(self, rows, current, next_p):
+        """Generator that yields between expansions; its return value is the chosen path."""
+        shape = current['shape']
+        start = (current['rotation'] % len(shape), current['x'], current['y'])
+        finals, parents = find_placements(BitBoard.from_rows(list(rows)), shape, start)
+        yield
+
+        candidates = []
+        seen = set() # Different paths to the same resulting board are pruned
+        for state in finals:
+            new_rows, cleared = lock_rows(rows, shape, state)
+            if new_rows is None or new_rows in seen:
+                continue
+            seen.add(new_rows)
+            candidates.append((self.evaluate(new_rows, cleared), state, new_rows, cleared))
+        if not candidates:
+            return None
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        best_score, best_state = candidates[0][0], candidates[0][1]
+        yield
+
+        # Lookahead with the next piece, only for the most promising boards
+        if next_p is not None:
+            next_shape = next_p['shape']
+            best_score = -math.inf
+            for _score, state, new_rows, cleared in candidates[:self.beam_width]:
+                next_finals, _ = find_placements(BitBoard.from_rows(list(new_rows)), next_shape, (0, next_p['x'], next_p['y']))
+                for next_state in next_finals:
+                    final_rows, next_cleared = lock_rows(new_rows, next_shape, next_state)
+                    if final_rows is None:
+                        continue
+                    score = self.evaluate(final_rows, cleared + next_cleared)
+                    if score > best_score:
+                        best_score, best_state = score, state
+                yield
+            if best_score == -math.inf: # Every lookahead tops out, fall back to one piece
+                best_state = candidates[0][1]
+
+        path = []
+        state = best_state
+        while state is not None:
+            path.append(state)
+            state = parents[state]
+        path.reverse()
+        return path
+
+    def think(self, sim):
+        """Runs the search until it finishes or think_budget is spent; True once a plan is ready.
+
+        Call it once per rendered frame, not per logic tick. A new piece
+        starts a new search.
+        """
+        piece = sim.current
+        if piece is not self.piece: # New piece spawned, plan from scratch
+            self.piece = piece
+            self.plan = None
+            self.search = self.search_moves(tuple(sim.board.rows), piece, sim.next)
+        if self.search is None:
+            return self.plan is not None
+        deadline = time.perf_counter() + self.think_budget
+        try:
+            while time.perf_counter() < deadline:
+                next(self.search)
+        except StopIteration as done:
+            self.search = None
+            self.plan = done.value[1:] if done.value else [] # First waypoint is the current state
+            return True
+        return False
+
+    def next_action(self, sim):
+        """Action bits for this tick; 0 until think() has a plan for this piece, and between button presses."""
+        if sim.current is not self.piece or self.plan is None:
+            return 0
+        if self.last_action: # Release between presses so every press is a new edge
+            self.last_action = 0
+            return 0
+        self.last_action = self.follow_plan(sim)
+        return self.last_action
+
+    def follow_plan(self, sim):
+        piece = sim.current
+        shape = piece['shape']
+        rot, x, y = piece['rotation'] % len(shape), piece['x'], piece['y']
+        while self.plan:
+            w_rot, w_x, w_y = self.plan[0]
+            if w_rot != rot:
+                action, move = ACTION_ROTATE, (0, 0, 1)
+            elif w_x != x:
+                action, move = (ACTION_LEFT, (-1, 0, 0)) if w_x < x else (ACTION_RIGHT, (1, 0, 0))
+            elif all(p[0] == rot and p[1] == x for p in self.plan):
+                return ACTION_HARD_DROP # Only straight down is left
+            elif w_y > y:
+                return ACTION_DOWN
+            else: # Reached, or gravity already carried the piece past it
+                self.plan.pop(0)
+                continue
+
+            # Gravity pulled the piece below the spot this move needed, or it no longer fits
+            if w_y != y or not sim.fits(piece, *move):
+                self.search = self.search_moves(tuple(sim.board.rows), piece, sim.next)
+                self.plan = None
+                return 0
+            return action
+        return 0 # Resting on the target, waiting for the lock delay
+
+# --- Frame Profiler ---
+# F3 toggles per-phase timing of every frame, with a p50/p95/p99 overlay in
+# the top-left corner; F4 (or quitting) writes the recorded frames as Chrome
+# trace-event JSON, viewable in chrome://tracing or ui.perfetto.dev.
+PROFILE_HISTORY = 600 # Frames kept per phase (10 s at 60 FPS)
+PROFILE_TRACE_FILE = "tetris-trace.json"
+PROFILE_OVERLAY_POS = (8, 8)
+
+class FrameProfiler:
+    """Per-phase ring buffers of (start, seconds) samples.
+
+    start() returns a timestamp to hand back to stop(name, ...); both are
+    nearly free while the profiler is disabled.
+    """
+
+    def __init__(self, history=PROFILE_HISTORY):
+        self.enabled = False
+        self.history = history
+        self.phases = {} # Phase name -> deque of (perf_counter start, seconds), insertion order = overlay order
+
+    def start(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, name, start):
+        if not self.enabled:
+            return
+        ring = self.phases.get(name)
+        if ring is None:
+            ring = self.phases[name] = deque(maxlen=self.history)
+        ring.append((start, time.perf_counter() - start))
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.phases.clear() # Don't mix old samples into the new window
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        """Durations in milliseconds at the given percentiles (zeros if no samples)."""
+        samples = sorted(seconds for _start, seconds in self.phases.get(name, ()))
+        if not samples:
+            return [0.0] * len(points)
+        return [samples[min(len(samples) - 1, len(samples) * p // 100)] * 1000 for p in points]
+
+    def export_trace(self, path=PROFILE_TRACE_FILE):
+        """Writes every buffered sample as a complete ("X") trace event; returns the event count."""
+        events = []
+        for name, ring in self.phases.items():
+            for start, seconds in ring:
+                events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                               "ts": round(start * 1e6, 1), "dur": round(seconds * 1e6, 1)})
+        events.sort(key=lambda e: (e["ts"], -e["dur"])) # Enclosing "frame" spans before their phases
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+    def draw_overlay(self, surface):
+        """Draws the timing table and returns the area it covers."""
+        lines = ["%-10s %6s %6s %6s" % ("ms", "p50", "p95", "p99")]
+        for name in self.phases:
+            lines.append("%-10s %6.2f %6.2f %6.2f" % ((name,) + tuple(self.percentiles(name))))
+        labels = [profile_font.render(line, True, VALUE_COLOR) for line in lines]
+        x, y = PROFILE_OVERLAY_POS
+        width = max(label.get_width() for label in labels) + 8
+        height = sum(label.get_height() for label in labels) + 8
+        area = pygame.Rect(x, y, width, height)
+        surface.fill((0, 0, 0), area)
+        y += 4
+        for label in labels:
+            surface.blit(label, (x + 4, y))
+            y += label.get_height()
+        return area
+
+profiler = FrameProfiler()
+
+# --- Drawing ---
+label_cache = {} # (text, font, color) -> rendered label surface
+LABEL_CACHE_LIMIT = 256 # The score flash renders a new colour every frame, keep this bounded
+
+def get_label(text, font, color):
+    key = (text, font, color)
+    label = label_cache.get(key)
+    if label is None:
+        if len(label_cache) >= LABEL_CACHE_LIMIT:
+            label_cache.clear()
+        label = font.render(text, True, color)
+        label_cache[key] = label
+    return label
 
 def draw_text(surface, text, font, color, x, y, center=True):
-    label = font.render(text, True, color)
+    label = get_label(text, font, color)
     if center:
         pos = label.get_rect(center=(x, y))
     else:
         pos = label.get_rect(topleft=(x, y))
-    surface.blit(label, pos)
+    return surface.blit(label, pos)
 
 def draw_grid(surface, grid_data):
     for r in range(20):
@@ -412,12 +1564,50 @@ def draw_grid(surface, grid_data):
                          (GRID_TOP_LEFT_X + c * BLOCK_SIZE, GRID_TOP_LEFT_Y),
                          (GRID_TOP_LEFT_X + c * BLOCK_SIZE, GRID_TOP_LEFT_Y + PLAY_HEIGHT), 1) # Thinner lines
 
-def draw_next_piece(surface, piece):
-    if piece is None: return # Safety check
-    draw_text(surface, "NEXT", small_font, (200, 200, 220), GRID_TOP_LEFT_X + PLAY_WIDTH + 80, GRID_TOP_LEFT_Y + 30, center=True)
-    sx = GRID_TOP_LEFT_X + PLAY_WIDTH + 80 # Center in the side panel area more accurately
-    sy = GRID_TOP_LEFT_Y + 100
+# --- UI Layout ---
+PLAY_AREA_RECT = (GRID_TOP_LEFT_X, GRID_TOP_LEFT_Y, PLAY_WIDTH, PLAY_HEIGHT)
+BOARD_LAYER_RECT = (GRID_TOP_LEFT_X - 4, GRID_TOP_LEFT_Y - 4, PLAY_WIDTH + 8, PLAY_HEIGHT + 8) # Block glow spills a few pixels past the playfield
+UI_SIDE_X = GRID_TOP_LEFT_X // 2 # Position in left panel
+SCORE_VALUE_Y = GRID_TOP_LEFT_Y + PLAY_HEIGHT // 2 - 80 # Move up
+LEVEL_VALUE_Y = SCORE_VALUE_Y + 100
+LINES_VALUE_Y = LEVEL_VALUE_Y + 100
+NEXT_PANEL_X = GRID_TOP_LEFT_X + PLAY_WIDTH + 80 # Center in the side panel area more accurately
+NEXT_PANEL_Y = GRID_TOP_LEFT_Y + 100
+LABEL_COLOR = (200, 200, 220)
+VALUE_COLOR = (220, 220, 255)
+TITLE_COLOR = (180, 180, 220)
+
+def draw_background(surface):
+    """Gradient, empty playfield, title and the static UI captions."""
+    top_color = (15, 15, 25)
+    bottom_color = (35, 35, 55)
+    for y in range(SCREEN_HEIGHT):
+         ratio = y / SCREEN_HEIGHT
+         color = tuple(int(top + (bottom - top) * ratio) for top, bottom in zip(top_color, bottom_color))
+         pygame.draw.line(surface, color, (0, y), (SCREEN_WIDTH, y))
+
+    pygame.draw.rect(surface, GRID_BG_COLOR, PLAY_AREA_RECT) # Playfield background
+
+    draw_text(surface, "NEXT", small_font, LABEL_COLOR, NEXT_PANEL_X, GRID_TOP_LEFT_Y + 30, center=True)
+    draw_text(surface, "SCORE", small_font, LABEL_COLOR, UI_SIDE_X, SCORE_VALUE_Y - 40, center=True)
+    draw_text(surface, "LEVEL", small_font, LABEL_COLOR, UI_SIDE_X, LEVEL_VALUE_Y - 30, center=True)
+    draw_text(surface, "LINES", small_font, LABEL_COLOR, UI_SIDE_X, LINES_VALUE_Y - 30, center=True)
+    draw_text(surface, "FANCY TETRIS", main_font, TITLE_COLOR, SCREEN_WIDTH // 2, 35, center=True) # Adjusted Y pos
+
+def draw_locked_blocks(surface, locked_data):
+    for (r, c), (color, glow_color) in locked_data.items():
+        if 0 <= r < 20: # Only draw visible locked blocks
+             draw_block(surface, color, glow_color,
+                        GRID_TOP_LEFT_X + c * BLOCK_SIZE,
+                        GRID_TOP_LEFT_Y + r * BLOCK_SIZE, BLOCK_SIZE)
+
+    # Grid Lines (on top of locked blocks)
+    draw_grid(surface, None)
+    pygame.draw.rect(surface, GRID_LINE_COLOR, PLAY_AREA_RECT, 3) # Border
 
+def draw_next_piece(surface, piece):
+    """Draws the preview blocks and returns the area covered (None if nothing drawn)."""
+    if piece is None: return None # Safety check
     shape_format = piece['shape'][0]
     min_r = min(r for r, c in shape_format)
     max_r = max(r for r, c in shape_format)
@@ -426,42 +1616,25 @@ def draw_next_piece(surface, piece):
     shape_h = (max_r - min_r + 1) * BLOCK_SIZE
     shape_w = (max_c - min_c + 1) * BLOCK_SIZE
 
-    start_draw_x = sx - shape_w // 2
-    start_draw_y = sy - shape_h // 2
+    start_draw_x = NEXT_PANEL_X - shape_w // 2
+    start_draw_y = NEXT_PANEL_Y - shape_h // 2
 
+    dirty = None
     for r_off, c_off in shape_format:
-         draw_block(surface, piece['color'], piece['glow_color'],
-                    start_draw_x + (c_off - min_c) * BLOCK_SIZE,
-                    start_draw_y + (r_off - min_r) * BLOCK_SIZE, BLOCK_SIZE * 0.8) # Draw slightly smaller in preview
-
-
-def draw_score_level(surface, score_val, level_val, lines_val, animated=False):
-    score_label_y = GRID_TOP_LEFT_Y + PLAY_HEIGHT // 2 - 80 # Move up
-    score_text = f"{score_val:07d}"
-    score_color = (220, 220, 255)
-    current_font = score_font
-
+         rect = draw_block(surface, piece['color'], piece['glow_color'],
+                           start_draw_x + (c_off - min_c) * BLOCK_SIZE,
+                           start_draw_y + (r_off - min_r) * BLOCK_SIZE, PREVIEW_BLOCK_SIZE)
+         dirty = rect if dirty is None else dirty.union(rect)
+    return dirty
+
+def get_score_color(animated):
+    score_color = VALUE_COLOR
     if animated: # Fancy score animation
         anim_progress = min(1, (time.time() - score_update_time) / SCORE_ANIMATION_DURATION)
         # Lerp color from yellow back to white
         flash_color = (255, 255, 0)
         score_color = tuple(int(flash + (normal - flash) * anim_progress) for flash, normal in zip(flash_color, score_color))
-        # Scale font size (requires rendering a new font object potentially, or pre-rendering sizes)
-        # Simple: Just use color flash
-        
-    ui_side_x = GRID_TOP_LEFT_X // 2 # Position in left panel
-
-    draw_text(surface, "SCORE", small_font, (200, 200, 220), ui_side_x, score_label_y - 40, center=True)
-    draw_text(surface, score_text, current_font, score_color, ui_side_x, score_label_y, center=True)
-
-    level_label_y = score_label_y + 100
-    draw_text(surface, "LEVEL", small_font, (200, 200, 220), ui_side_x, level_label_y - 30, center=True)
-    draw_text(surface, str(level_val), main_font, (220, 220, 255), ui_side_x, level_label_y, center=True)
-
-    lines_label_y = level_label_y + 100
-    draw_text(surface, "LINES", small_font, (200, 200, 220), ui_side_x, lines_label_y - 30, center=True)
-    draw_text(surface, str(lines_val), main_font, (220, 220, 255), ui_side_x, lines_label_y, center=True)
-
+    return score_color
 
 def draw_game_over(surface, alpha):
     overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
@@ -472,198 +1645,263 @@ def draw_game_over(surface, alpha):
         draw_text(surface, "GAME OVER", game_over_font, (255, 50, 50), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50, center=True)
         draw_text(surface, "Press ENTER to Play Again", main_font, (200, 200, 220), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50, center=True)
 
-def draw_window(surface, grid_data, locked_data, current_p, next_p, score_val, level_val, lines_val, game_state, game_over_alpha, score_anim_active):
-    # 1. Backgrounds
-    surface.fill(BACKGROUND_COLOR)
-    # Draw a subtle gradient for the UI background?
-    bg_rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
-    # pygame.draw.rect(surface, UI_AREA_COLOR, bg_rect) # Simple fill
-
-    # Fancy gradient background attempt
-    top_color = (15, 15, 25)
-    bottom_color = (35, 35, 55)
-    for y in range(SCREEN_HEIGHT):
-         ratio = y / SCREEN_HEIGHT
-         color = tuple(int(top + (bottom - top) * ratio) for top, bottom in zip(top_color, bottom_color))
-         pygame.draw.line(surface, color, (0, y), (SCREEN_WIDTH, y))
-
-
-    play_area_rect = pygame.Rect(GRID_TOP_LEFT_X, GRID_TOP_LEFT_Y, PLAY_WIDTH, PLAY_HEIGHT)
-    pygame.draw.rect(surface, GRID_BG_COLOR, play_area_rect) # Playfield background
-
-    # 2. Locked Blocks
-    for (r, c), (color, glow_color) in locked_data.items():
-        if 0 <= r < 20: # Only draw visible locked blocks
-             draw_block(surface, color, glow_color,
-                        GRID_TOP_LEFT_X + c * BLOCK_SIZE,
-                        GRID_TOP_LEFT_Y + r * BLOCK_SIZE, BLOCK_SIZE)
-
-    # 3. Grid Lines (on top of locked blocks)
-    draw_grid(surface, grid_data)
-    pygame.draw.rect(surface, GRID_LINE_COLOR, play_area_rect, 3) # Border
-
-    # 4. Falling Piece Ghost (Drop Shadow)
-    if game_state == "playing" and current_p:
+# --- Layered Renderer ---
+class LayeredRenderer:
+    """Keeps the static parts of the frame cached and redraws only what changed.
+
+    background: gradient, empty playfield, title and captions, rendered once.
+    scene:      background plus locked blocks and grid lines, re-baked only when
+                the board changes.
+    On top of the scene each frame draws the ghost and falling piece, plus the
+    score/level/lines/next slots whose contents changed, and pushes just those
+    rectangles with pygame.display.update(rects). Overlay frames (pause, game
+    over) and the first frame after invalidate() fall back to a full flip.
+    """
+
+    def __init__(self):
+        self.background = None
+        self.scene = None
+        self.board_source = None # Grid the scene was last baked from
+        self.board_version = 0
+        self.dynamic_rects = [] # Ghost/piece areas drawn last frame
+        self.slots = {} # name -> (value key, screen rect)
+        self.full_redraw = True
+
+    def invalidate(self):
+        """Forces the next frame to repaint and flip the whole screen."""
+        self.full_redraw = True
+
+    def build_layers(self):
+        self.background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        if pygame.display.get_surface() is not None:
+            self.background = self.background.convert()
+        draw_background(self.background)
+        self.scene = self.background.copy()
+        self.board_source = None
+
+    def bake_board(self, locked_data):
+        self.scene.blit(self.background, BOARD_LAYER_RECT, BOARD_LAYER_RECT)
+        draw_locked_blocks(self.scene, locked_data)
+
+    def restore(self, surface, rect):
+        surface.blit(self.scene, rect, rect)
+
+    def update_slot(self, surface, name, key, draw, dirty, touched, redraw_below):
+        """Redraws a UI slot when its value changed or something was drawn over it.
+
+        The slot area is restored from the scene and whatever sits below the text
+        (the falling piece) is redrawn clipped to it, so the text stays on top.
+        """
+        previous = self.slots.get(name)
+        changed = previous is None or previous[0] != key
+        old_rect = previous[1] if previous is not None else None
+        if not changed and (old_rect is None or old_rect.collidelist(touched) == -1):
+            return
+        if old_rect is not None:
+            self.restore(surface, old_rect)
+            surface.set_clip(old_rect)
+            redraw_below(surface)
+            surface.set_clip(None)
+            dirty.append(old_rect)
+        rect = draw(surface)
+        if rect is not None:
+            dirty.append(rect)
+        self.slots[name] = (key, rect)
+
+    def draw_pieces(self, surface, grid_data, current_p):
+        rects = []
+        started = profiler.start()
+        # Falling Piece Ghost (Drop Shadow), at the landing row the board has cached
         ghost_p = current_p.copy()
-        ghost_valid = True
-        while ghost_valid:
-            if not is_valid_position(ghost_p, grid_data, adj_y=1):
-                ghost_valid = False # Found the final valid spot above obstacle/floor
-            else:
-                ghost_p['y'] +=1
-        
-        ghost_shape_pos = get_formatted_shape(ghost_p)
-        ghost_color = (80, 80, 80, 100) # Semi-transparent gray
-        
-        for r, c in ghost_shape_pos:
+        shape = current_p['shape']
+        ghost_p['y'] = grid_data.landing_y(shape, current_p['rotation'] % len(shape), current_p['x'], current_p['y'])
+
+        for r, c in get_formatted_shape(ghost_p):
              if r >= 0: # Only draw ghost within grid bounds
-                ghost_rect = pygame.Rect(GRID_TOP_LEFT_X + c * BLOCK_SIZE,
-                                      GRID_TOP_LEFT_Y + r * BLOCK_SIZE,
-                                      BLOCK_SIZE, BLOCK_SIZE)
-                # Draw simpler rectangle for ghost
-                ghost_surf = pygame.Surface((BLOCK_SIZE, BLOCK_SIZE), pygame.SRCALPHA)
-                pygame.draw.rect(ghost_surf, ghost_color, (0,0, BLOCK_SIZE, BLOCK_SIZE), border_radius=2)
-                pygame.draw.rect(ghost_surf, (200,200,200, 120), (1,1, BLOCK_SIZE-2, BLOCK_SIZE-2), 1, border_radius=2) # Thin border
-                surface.blit(ghost_surf, ghost_rect.topleft)
-
-
-    # 5. Falling Piece (Actual)
-    if game_state == "playing" and current_p:
-        render_y_pixel = GRID_TOP_LEFT_Y + current_piece_y_float * BLOCK_SIZE
-        shape_pos = get_formatted_shape(current_p)
+                rects.append(draw_ghost_block(surface, GRID_TOP_LEFT_X + c * BLOCK_SIZE, GRID_TOP_LEFT_Y + r * BLOCK_SIZE))
+        profiler.stop("ghost", started)
 
-        for r, c in shape_pos:
+        # Falling Piece (Actual)
+        started = profiler.start()
+        render_y_pixel = GRID_TOP_LEFT_Y + current_piece_y_float * BLOCK_SIZE
+        for r, c in get_formatted_shape(current_p):
             block_pixel_y = render_y_pixel + (r - current_p['y']) * BLOCK_SIZE # Calculate individual block y pixel
             # Only draw blocks vertically within visible playfield or slightly above
             if block_pixel_y > GRID_TOP_LEFT_Y - BLOCK_SIZE:
-                draw_block(surface, current_p['color'], current_p['glow_color'],
-                           GRID_TOP_LEFT_X + c * BLOCK_SIZE,
-                           block_pixel_y,
-                           BLOCK_SIZE,
-                           shadow=True) # Add shadow effect to falling piece
-
-
-    # 6. UI Elements
-    draw_next_piece(surface, next_p)
-    draw_score_level(surface, score_val, level_val, lines_val, score_anim_active)
-    draw_text(surface, "FANCY TETRIS", main_font, (180, 180, 220), SCREEN_WIDTH // 2, 35, center=True) # Adjusted Y pos
-
-    # 7. Game Over Screen / Pause Screen
-    if game_state == "game_over":
-        draw_game_over(surface, game_over_alpha)
-    elif game_state == "paused":
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 150)) # Dark overlay for pause
-        surface.blit(overlay, (0,0))
-        draw_text(surface, "PAUSED", game_over_font, (220, 220, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, center=True)
-
+                rects.append(draw_block(surface, current_p['color'], current_p['glow_color'],
+                                        GRID_TOP_LEFT_X + c * BLOCK_SIZE,
+                                        block_pixel_y,
+                                        BLOCK_SIZE,
+                                        shadow=True)) # Add shadow effect to falling piece
+        profiler.stop("piece", started)
+        return rects
+
+    def draw(self, surface, grid_data, locked_data, current_p, next_p, score_val, level_val, lines_val, game_state, game_over_alpha, score_anim_active):
+        if self.scene is None:
+            self.build_layers()
+
+        dirty = []
+        board_changed = grid_data is not self.board_source or grid_data.version != self.board_version
+        if board_changed:
+            started = profiler.start()
+            self.bake_board(locked_data)
+            self.board_source = grid_data
+            self.board_version = grid_data.version
+            profiler.stop("locked", started)
+
+        started = profiler.start()
+        full = self.full_redraw
+        if full:
+            surface.blit(self.scene, (0, 0))
+            self.slots.clear()
+        else:
+            for rect in self.dynamic_rects:
+                self.restore(surface, rect)
+            dirty.extend(self.dynamic_rects)
+            if board_changed:
+                self.restore(surface, BOARD_LAYER_RECT)
+                dirty.append(BOARD_LAYER_RECT)
+        profiler.stop("background", started)
+
+        touched = list(dirty) # Areas restored from the scene this frame
+        def draw_dynamic(surf):
+            if game_state == "playing" and current_p:
+                return self.draw_pieces(surf, grid_data, current_p)
+            return []
+        self.dynamic_rects = draw_dynamic(surface)
+        dirty.extend(self.dynamic_rects)
+        touched.extend(self.dynamic_rects)
+
+        # UI Elements, re-rendered only when their value changes or got painted over
+        started = profiler.start()
+        next_key = (id(next_p['shape']), next_p['color']) if next_p else None
+        score_color = get_score_color(score_anim_active)
+        slots = [
+            ("next", next_key, lambda surf: draw_next_piece(surf, next_p)),
+            ("score", (score_val, score_color),
+             lambda surf: draw_text(surf, f"{score_val:07d}", score_font, score_color, UI_SIDE_X, SCORE_VALUE_Y, center=True)),
+            ("level", level_val,
+             lambda surf: draw_text(surf, str(level_val), main_font, VALUE_COLOR, UI_SIDE_X, LEVEL_VALUE_Y, center=True)),
+            ("lines", lines_val,
+             lambda surf: draw_text(surf, str(lines_val), main_font, VALUE_COLOR, UI_SIDE_X, LINES_VALUE_Y, center=True)),
+        ]
+        for name, key, draw in slots:
+            self.update_slot(surface, name, key, draw, dirty, touched, draw_dynamic)
+        if profiler.enabled: # Restored from the scene next frame, like the pieces
+            area = profiler.draw_overlay(surface)
+            self.dynamic_rects.append(area)
+            dirty.append(area)
+        profiler.stop("ui", started)
+
+        # Game Over Screen / Pause Screen cover everything, so flip the whole frame
+        overlay = game_state in ("game_over", "paused")
+        if game_state == "game_over":
+            draw_game_over(surface, game_over_alpha)
+        elif game_state == "paused":
+            overlay_surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+            overlay_surf.fill((0, 0, 0, 150)) # Dark overlay for pause
+            surface.blit(overlay_surf, (0,0))
+            draw_text(surface, "PAUSED", game_over_font, (220, 220, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, center=True)
+
+        # --- Update display ---
+        started = profiler.start()
+        if full or overlay:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
+        profiler.stop("flip", started)
+        self.full_redraw = overlay # The overlay darkened everything, repaint next frame
+
+renderer = LayeredRenderer()
 
-    # --- Update display ---
-    pygame.display.flip()
+def draw_window(surface, grid_data, locked_data, current_p, next_p, score_val, level_val, lines_val, game_state, game_over_alpha, score_anim_active):
+    renderer.draw(surface, grid_data, locked_data, current_p, next_p, score_val, level_val, lines_val,
+                  game_state, game_over_alpha, score_anim_active)
+
+# --- Frame Timing ---
+class FixedStepClock:
+    """Turns wall-clock frame times into whole fixed-length logic ticks.
+
+    Time left over after the last whole tick carries into the next frame, and
+    alpha() says how far the display sits between two ticks. A single frame
+    never runs more than max_ticks ticks: after a stall the game loses that
+    time instead of burning logic work to catch up on frames nobody will see.
+    """
+
+    def __init__(self, rate=LOGIC_RATE, max_ticks=MAX_CATCH_UP_TICKS):
+        self.dt = 1.0 / rate
+        self.max_ticks = max_ticks
+        self.reset()
+
+    def reset(self):
+        """Starts counting from now, e.g. after a pause or a new game."""
+        self.last = time.perf_counter()
+        self.accumulator = 0.0
+
+    def advance(self):
+        """Number of logic ticks due since the previous call."""
+        now = time.perf_counter()
+        self.accumulator = min(self.accumulator + now - self.last, self.max_ticks * self.dt)
+        self.last = now
+        ticks = int(self.accumulator / self.dt)
+        self.accumulator -= ticks * self.dt
+        return ticks
+
+    def alpha(self):
+        return min(1.0, self.accumulator / self.dt)
+
+scheduler = FixedStepClock()
 
 # --- Game Logic Functions ---
+# Thin pygame client around TetrisSim: keyboard events become action bits and
+# the simulation's events become sounds.
+
+KEY_ACTIONS = {
+    pygame.K_LEFT: ACTION_LEFT,
+    pygame.K_RIGHT: ACTION_RIGHT,
+    pygame.K_DOWN: ACTION_DOWN,
+    pygame.K_UP: ACTION_ROTATE, # Rotate Clockwise
+    pygame.K_x: ACTION_ROTATE,
+    pygame.K_SPACE: ACTION_HARD_DROP,
+} if PYGAME_AVAILABLE else {}
+
+def handle_input():
+    """Drains key events into input_held and input_pressed; run once per rendered frame."""
+    global input_held, input_pressed, game_state, autoplayer
 
-def handle_input(current_p, grid_data):
-    global current_piece_y_float, score, game_state, fall_time, landed, last_lock_time, fall_speed
-    current_time = time.time()
-    modified = False # Track if piece position/rotation changed by input
-
-    # Check for quit events first
     for event in pygame.event.get(eventtype=[pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP]):
         if event.type == pygame.QUIT:
              pygame.event.post(event) # Put it back for the main loop to handle exit
-             return fall_speed # Return current speed, don't process further inputs if quitting
+             return # Don't process further inputs if quitting
 
         if event.type == pygame.KEYDOWN:
-            key = event.key
-            if key in (pygame.K_UP, pygame.K_x): # Rotate Clockwise
-                 if is_valid_position(current_p, grid_data, adj_rot=1):
-                     current_p['rotation'] = (current_p['rotation'] + 1) % len(current_p['shape'])
-                     if SOUND_ENABLED: safe_play(sound_rotate)
-                     modified = True
-                     # Wall kick logic could go here if implemented
-            elif key == pygame.K_SPACE: # Hard Drop
-                drop_amount = 0
-                temp_p = current_p.copy()
-                while is_valid_position(temp_p, grid_data, adj_y=1):
-                    temp_p['y'] += 1
-                    drop_amount += 1
-                if drop_amount > 0:
-                    current_p['y'] = temp_p['y']
-                    current_piece_y_float = float(current_p['y']) # Snap float pos
-                    score += drop_amount * SCORE_HARD_DROP_BONUS
-                    modified = True # Movement occurred
-                    # Force immediate lock check on next logic update:
-                    landed = True # Consider it landed for logic
-                    fall_time = fall_speed + LOCK_DELAY + 0.1 # Force fall check & lock check to pass immediately
-                    if SOUND_ENABLED: safe_play(sound_hard_drop)
-            elif key == pygame.K_p: # Pause
+            if event.key == pygame.K_p: # Pause
                  if game_state == "playing": game_state = "paused"
                  elif game_state == "paused": game_state = "playing"
-                 # Need to reset time anchors after unpausing - handled in main loop potentially
-                 last_fall_time = current_time # Reset timer anchor on pause/unpause
-            elif key == pygame.K_LEFT:
-                 move_key_held["left"] = True
-                 das_triggered["left"] = False
-                 last_move_time["left"] = current_time # Record initial press time
-                 if is_valid_position(current_p, grid_data, adj_x=-1):
-                     current_p['x'] -= 1
-                     modified = True
-            elif key == pygame.K_RIGHT:
-                 move_key_held["right"] = True
-                 das_triggered["right"] = False
-                 last_move_time["right"] = current_time
-                 if is_valid_position(current_p, grid_data, adj_x=1):
-                     current_p['x'] += 1
-                     modified = True
-            elif key == pygame.K_DOWN:
-                 move_key_held["down"] = True
-                 last_move_time["down"] = current_time
-                 # Faster falling speed handled below, process one step immediately?
-                 if is_valid_position(current_p, grid_data, adj_y=1):
-                     # Move down one step immediately on press for responsiveness
-                     current_p['y'] += 1
-                     current_piece_y_float = float(current_p['y'])
-                     score += SCORE_SOFT_DROP_BONUS
-                     fall_time = 0 # Reset fall timer after manual move
-                     modified = True
+            elif event.key == pygame.K_a: # Toggle autoplay
+                 autoplayer = None if autoplayer else AutoPlayer()
+            elif event.key == pygame.K_F3: # Toggle the frame profiler overlay
+                 profiler.toggle()
+            elif event.key == pygame.K_F4 and profiler.enabled:
+                 save_trace()
+            bit = KEY_ACTIONS.get(event.key, 0)
+            input_held |= bit
+            input_pressed |= bit
+        elif event.type == pygame.KEYUP:
+            input_held &= ~KEY_ACTIONS.get(event.key, 0)
 
+def tick_action():
+    """TetrisSim action bits for one logic tick.
 
-        elif event.type == pygame.KEYUP:
-            key = event.key
-            if key == pygame.K_LEFT: move_key_held["left"] = False
-            elif key == pygame.K_RIGHT: move_key_held["right"] = False
-            elif key == pygame.K_DOWN: move_key_held["down"] = False
-
-
-    # Continuous movement handling (DAS/ARR) - run even if KEYDOWN didn't fire this exact frame
-    current_fall_speed_used = FALL_SPEED_FAST if move_key_held["down"] else fall_speed
-
-    # Horizontal Movement
-    for direction, key_code in [("left", -1), ("right", 1)]:
-        if move_key_held[direction]:
-            elapsed_since_last = current_time - last_move_time[direction]
-            
-            # Check DAS first (only trigger DAS movement after delay)
-            if not das_triggered[direction] and elapsed_since_last >= DAS_DELAY:
-                 das_triggered[direction] = True
-                 last_move_time[direction] = current_time # Reset timer for first ARR check
-                 if is_valid_position(current_p, grid_data, adj_x=key_code):
-                     current_p['x'] += key_code
-                     modified = True
-
-            # Then check ARR (only trigger repeats if DAS is active and ARR time passed)
-            elif das_triggered[direction] and elapsed_since_last >= ARR_DELAY:
-                 last_move_time[direction] = current_time # Reset timer for next repeat
-                 if is_valid_position(current_p, grid_data, adj_x=key_code):
-                     current_p['x'] += key_code
-                     modified = True
-
-    # If any movement/rotation happened, potentially reset the lock timer if piece is now touching down
-    if modified:
-         reset_lock_delay(current_p, grid_data)
-
-    return current_fall_speed_used
+    A tap shorter than a tick still reaches the game: it is latched in
+    input_pressed until the next tick consumes it.
+    """
+    global input_pressed
+    if autoplayer is not None: # The AI presses the same buttons the keyboard would
+        return autoplayer.next_action(sim)
+    action = input_held | input_pressed
+    input_pressed = 0
+    return action
 
 def safe_play(sound):
      """Utility to safely play a sound object that might be None."""
@@ -675,206 +1913,121 @@ def safe_play(sound):
         except Exception as e:
              print(f"Error playing sound: {e}")
 
-
-def reset_lock_delay(current_p, grid_data):
-    """Resets the lock delay timer ONLY if the piece is touching down AFTER a move."""
-    global last_lock_time, landed
-    # Check if currently landed (cannot move down further)
-    if not is_valid_position(current_p, grid_data, adj_y=1):
-        last_lock_time = time.time() # Reset timer
-        # 'landed' flag itself is set/unset during the main fall logic (update_game_state)
-    # If piece is moved horizontally while landed, reset lock timer.
-
-
-def update_game_state(current_p, next_p, grid_data, locked_pos, current_fall_spd):
-    """Updates piece falling, locking, line clearing, spawning."""
-    global fall_time, current_piece_y_float, score, level, lines_cleared_total, fall_speed
-    global last_lock_time, landed, game_state, game_over_start_time
-    global current_piece # Allow modification
-
-    current_time = time.time()
-    delta_time = current_time - last_fall_time
-    # Clamp delta_time to prevent huge jumps after pause/lag
-    delta_time = min(delta_time, 0.2) # Limit to 200ms max jump
-
-    # DEBUG: Uncomment to watch timings
-    # print(f"Delta: {delta_time:.4f}, Fall Time: {fall_time:.4f}, FloatY: {current_piece_y_float:.4f}, IntY: {current_p['y']}, Landed: {landed}, Speed: {current_fall_spd:.4f}")
-
-    # Check if currently touching down
-    is_touching_down = not is_valid_position(current_p, grid_data, adj_y=1)
-
-    # --- Handle Locking ---
-    if landed: # If the piece was flagged as landed previously...
-        if is_touching_down: # ...and it's still touching down...
-             # Check lock delay timer
-             if current_time - last_lock_time >= LOCK_DELAY:
-                 # --- LOCK THE PIECE ---
-                 shape_pos = get_formatted_shape(current_p)
-                 newly_locked = False
-                 for r, c in shape_pos:
-                     # Only lock blocks fully within the grid's bounds or at the top row
-                     if 0 <= r < 20 and 0 <= c < 10:
-                          locked_pos[(r, c)] = (current_p['color'], current_p['glow_color'])
-                          newly_locked = True
-                     elif r < 0 and 0 <= c < 10: # Locked piece partially above screen?
-                          # Could signify game over depending on exact rules
-                          locked_pos[(r, c)] = (current_p['color'], current_p['glow_color'])
-                          newly_locked = True # Or maybe check_lost handles this later? Let's allow locking for now.
-
-
-                 if not newly_locked: # Piece might have been moved/rotated off floor just before timer ended
-                     landed = False # It's not actually locked
-                     fall_time = 0 # Restart fall timer
-                     # Keep going to falling logic...
-                 else:
-                    # --- POST-LOCK ACTIONS ---
-                    grid_data = create_grid(locked_pos) # Update logical grid immediately
-                    num_cleared, locked_pos = clear_lines(grid_data, locked_pos) # Check and clear lines
-
-                    # Update score/level AFTER line clear
-                    if num_cleared > 0:
-                        score_bonus = SCORE_PER_LINE[min(num_cleared, len(SCORE_PER_LINE)-1)] * level
-                        score += score_bonus
-                        lines_cleared_total += num_cleared
-                        new_level = (lines_cleared_total // LINES_PER_LEVEL) + 1
-                        if new_level > level:
-                            level = new_level
-                            fall_speed = max(0.03, FALL_SPEED_INITIAL * (FALL_SPEED_LEVEL_MULTIPLIER ** (level - 1)))
-                            # Play level up sound?
-                            # safe_play(sound_level_up)
-
-
-                    # --- CHECK GAME OVER CONDITION ---
-                    if check_lost(locked_pos): # Check if locked pieces are too high
-                         game_state = "game_over"
-                         game_over_start_time = time.time()
-                         safe_play(sound_game_over)
-                         return current_p, next_p, create_grid(locked_pos), locked_pos # Exit state update
-
-
-                    # --- SPAWN NEW PIECE ---
-                    current_p = next_p # current becomes the previous next
-                    next_p = get_shape() # Get a new next piece
-                    current_piece_y_float = 0.0 # Reset float pos
-                    fall_time = 0
-                    landed = False
-                    
-                    # Check if new piece spawns in an invalid spot (immediate Game Over)
-                    if not is_valid_position(current_p, create_grid(locked_pos)): # Check against updated grid
-                         game_state = "game_over"
-                         game_over_start_time = time.time()
-                         safe_play(sound_game_over)
-                         # Ensure the invalid piece is still assigned for drawing the final state? Yes.
-
-                    # Return the new state after locking and spawning
-                    return current_p, next_p, create_grid(locked_pos), locked_pos
-
-        else: # Was landed, but now isn't touching down (moved/rotated off ledge)
-             landed = False
-             fall_time = 0 # Restart fall timer as it's now falling again
-
-    # --- Handle Falling ---
-    # If not locked or just became unlanded
-    if not landed:
-        fall_time += delta_time # Accumulate time based on frame delta
-
-        # Calculate target Y position based purely on accumulated time
-        # Add a tiny epsilon to handle float precision near integers
-        potential_grid_steps = (fall_time / current_fall_spd)
-        
-        if potential_grid_steps >= 1.0: # Try to move down integer steps
-            steps_to_try = int(potential_grid_steps)
-            moved_steps = 0
-            can_move_further = True
-
-            for i in range(steps_to_try):
-                if is_valid_position(current_p, grid_data, adj_y=1):
-                    current_p['y'] += 1 # Move down one step
-                    moved_steps += 1
-                    # If soft dropping, add score
-                    if move_key_held["down"] and current_fall_spd == FALL_SPEED_FAST:
-                        score += SCORE_SOFT_DROP_BONUS
-                else:
-                    can_move_further = False # Hit something
-                    break
-            
-            # Adjust accumulated fall time based on steps actually taken
-            fall_time -= moved_steps * current_fall_spd
-            fall_time = max(0, fall_time) # Prevent negative time
-
-            # Now check if the piece has become landed *after* moving
-            if not can_move_further:
-                landed = True
-                last_lock_time = time.time() # Start lock timer
-                safe_play(sound_land)
-
-            # Always sync float Y to integer Y after grid step movements
-            current_piece_y_float = float(current_p['y'])
-
-        else:
-             # No full grid step occurred, just update smooth Y position
-             # Interpolate based on remaining fall_time within the current step
-             sub_step_progress = fall_time / current_fall_spd
-             current_piece_y_float = float(current_p['y']) + sub_step_progress
-        
-        # Final check: Even if we didn't process steps this frame, re-check if now landed
-        if not landed and not is_valid_position(current_p, grid_data, adj_y=1):
-             landed = True
-             last_lock_time = time.time() # Start timer
-             # Play land sound only if wasn't already playing/triggered
-             # (sound might have played if steps were processed above)
-             # safe_play(sound_land) # Maybe redundant?
-
-
-    # Update last fall time for the next frame's delta calculation
-    # This needs careful placement. Do it outside the landed logic.
-    # Should be updated every frame the playing state runs. Done in main loop now.
-
-    return current_p, next_p, grid_data, locked_pos # Return state
-
-
-def reset_game():
-    """Resets all game variables to start a new game."""
-    global grid, locked_blocks, current_piece, next_piece, score, level, lines_cleared_total
-    global fall_time, fall_speed, current_piece_y_float, last_fall_time, last_lock_time, landed
-    global game_state, last_score, score_update_time, piece_bag
-    global move_key_held, das_triggered, last_move_time
-
-    # print("--- RESETTING GAME ---") # DEBUG
-    
-    locked_blocks.clear() # Use clear() for existing dict
-    grid = create_grid(locked_blocks)
-    piece_bag.clear() # Clear and refill the bag
-    current_piece = get_shape()
-    next_piece = get_shape()
-    current_piece_y_float = 0.0
-    score = 0
+def play_sim_events(events):
+    for event in events: # TetrisSim event names double as SOUND_EFFECTS keys
+        safe_play(sound_bank.get(event))
+
+def sync_from_sim():
+    """Mirrors the simulation state into the globals the renderer reads."""
+    global grid, locked_blocks, current_piece, next_piece, score, level, lines_cleared_total, current_piece_y_float
+    grid = sim.board
+    locked_blocks = sim.board # Iterates like the old {(r, c): colours} dict
+    current_piece = sim.current
+    next_piece = sim.next
+    score = sim.score
+    level = sim.level
+    lines_cleared_total = sim.lines
+    current_piece_y_float = sim.piece_y_float
+
+def save_recording():
+    """Seals the game in progress and writes it to record_path."""
+    global recording
+    if recording is None or not recording.step_times:
+        return
+    recording.finish(sim)
+    try:
+        recording.save(record_path)
+        print(f"Saved replay to {record_path}")
+    except OSError as e:
+        print(f"Could not save replay: {e}")
+    recording = None
+
+def save_trace():
+    count = profiler.export_trace(PROFILE_TRACE_FILE)
+    print(f"Wrote {count} trace events to {PROFILE_TRACE_FILE}")
+
+def update_game_state(action, delta_time):
+    """Advances the simulation by one logic tick and reacts to what happened."""
+    global game_state, game_over_start_time, playback, previous_piece, previous_piece_y
+    if playback is not None: # Watching a replay: the recorded frame replaces live input
+        step = next(playback, None)
+        if step is None: # Recording ended before the game did (player quit)
+            playback = None
+            game_state = "game_over"
+            game_over_start_time = time.time()
+            return
+        action, delta_time = step
+    elif recording is not None:
+        delta_time = recording.record(action, delta_time)
+    previous_piece, previous_piece_y = sim.current, sim.piece_y_float
+    sim.step(action, delta_time)
+    play_sim_events(sim.events)
+    sync_from_sim()
+    if sim.game_over:
+        game_state = "game_over"
+        game_over_start_time = time.time()
+        playback = None
+        save_recording()
+
+
+def interpolated_piece_y(alpha):
+    """Falling piece y blended between the last two ticks; alpha is the FixedStepClock fraction.
+
+    Spawns and hard drops jump instead of sliding.
+    """
+    y = sim.piece_y_float
+    if previous_piece is sim.current and 0 <= y - previous_piece_y <= 1:
+        return previous_piece_y + (y - previous_piece_y) * alpha
+    return y
+
+def reset_game(seed=None, replay=None):
+    """Resets all game variables to start a new game, or to watch a Replay."""
+    global sim, game_state, last_score, score_update_time, input_held, input_pressed, recording, playback, previous_piece
+
+    save_recording() # Abandoned game still makes a usable replay
+    start_level = 1
+    if replay is not None:
+        seed, start_level = replay.seed, replay.start_level
+        playback = replay.steps()
+    else:
+        if seed is None:
+            seed = random.randrange(2**32) # Fresh game, but still replayable from sim.seed
+        recording = Replay(seed, start_level) if record_path is not None else None
+        playback = None
+    if sim is None:
+        sim = TetrisSim(seed, start_level)
+    else:
+        sim.reset(seed, start_level)
+    sync_from_sim()
     last_score = 0
     score_update_time = 0
-    level = 1
-    lines_cleared_total = 0
-    fall_time = 0
-    fall_speed = FALL_SPEED_INITIAL
-    last_fall_time = time.time() # *** Crucial: Initialize time anchor ***
-    last_lock_time = 0
-    landed = False
-
-    move_key_held = {"left": False, "right": False, "down": False}
-    das_triggered = {"left": False, "right": False}
-    last_move_time = {"left": 0, "right": 0, "down": 0}
+    previous_piece = None
+    scheduler.reset() # *** Crucial: Initialize time anchor ***
+    input_held = 0
+    input_pressed = 0
 
     game_state = "playing"
+    renderer.invalidate() # Coming from the start or game over screen
 
 
 # --- Main Game Loop ---
-def main():
-    global grid, locked_blocks, current_piece, next_piece, score, level, lines_cleared_total
-    global fall_time, fall_speed, current_piece_y_float, last_fall_time, landed
-    global game_state, game_over_start_time, last_score, score_update_time
+def main(autoplay=False, replay=None, logic_rate=LOGIC_RATE, render_fps=RENDER_FPS, profile=False, record=None):
+    global game_state, last_score, score_update_time, autoplayer, scheduler, current_piece_y_float, record_path
 
+    init_pygame()
+    record_path = record
+    scheduler = FixedStepClock(logic_rate)
     running = True
-    reset_game() # Initialize variables FIRST
-    game_state = "start" # THEN set to start screen state
+    score_anim_active = False
+    build_sprite_atlas() # Bake all block sprites once, before the first frame
+    if replay is not None: # Straight into playback, no start screen
+        reset_game(replay=replay)
+    else:
+        reset_game() # Initialize variables FIRST
+        game_state = "start" # THEN set to start screen state
+    if autoplay:
+        autoplayer = AutoPlayer()
+    profiler.enabled = profile
 
     while running:
         current_time = time.time()
@@ -888,10 +2041,6 @@ def main():
             break # Exit inner event loop
         if not running: continue # Go to next iteration of outer loop to exit
 
-        # Create logical grid (needed for drawing & logic checks)
-        # Could potentially optimize to only update when locked_blocks changes
-        grid = create_grid(locked_blocks)
-
         # --- State Handling ---
         if game_state == "start":
              # Draw Start Screen (content is the same as before)
@@ -905,6 +2054,8 @@ def main():
              draw_text(screen, "Down: Soft Drop", small_font, (160, 160, 180), SCREEN_WIDTH // 2, controls_y + 80, center=True)
              draw_text(screen, "Space: Hard Drop", small_font, (160, 160, 180), SCREEN_WIDTH // 2, controls_y + 105, center=True)
              draw_text(screen, "P: Pause", small_font, (160, 160, 180), SCREEN_WIDTH // 2, controls_y + 130, center=True)
+             draw_text(screen, "A: Autoplay", small_font, (160, 160, 180), SCREEN_WIDTH // 2, controls_y + 155, center=True)
+             draw_text(screen, "F3: Frame Timings", small_font, (160, 160, 180), SCREEN_WIDTH // 2, controls_y + 180, center=True)
              pygame.display.flip()
 
              # Event handling ONLY for start screen keys
@@ -918,15 +2069,11 @@ def main():
 
 
         elif game_state == "playing":
-            # DEBUG: Confirm entering this state
-            # print(f"Playing frame start: time={current_time:.2f}, last_fall={last_fall_time:.2f}")
-
-            # Store time anchor *before* logic/input for this frame
-            current_frame_start_time = time.time()
-
+            frame_started = profiler.start()
             # --- Input ---
-            # handle_input now manages its own event queue processing internally
-            effective_fall_speed = handle_input(current_piece, grid)
+            started = profiler.start()
+            handle_input()
+            profiler.stop("input", started)
 
             # Check if paused state was triggered by input handler
             if game_state == "paused":
@@ -934,19 +2081,18 @@ def main():
                  pass
             else:
                 # --- Game Logic Update ---
-                if current_piece: # Only update if there is a piece
-                    # update_game_state can change game_state to 'game_over'
-                    current_piece, next_piece, grid, locked_blocks = update_game_state(
-                        current_piece, next_piece, grid, locked_blocks, effective_fall_speed
-                    )
-                else: # Safety: if somehow current_piece is None, get a new one
-                    current_piece = next_piece
-                    next_piece = get_shape()
-                    if not is_valid_position(current_piece, grid): # Check if instantly lost
-                         game_state = "game_over"
-                         game_over_start_time = time.time()
-                         safe_play(sound_game_over)
-
+                # As many fixed ticks as wall time allows; update_game_state can change game_state to 'game_over'
+                if autoplayer is not None: # One search slice per frame, not per tick
+                    started = profiler.start()
+                    autoplayer.think(sim)
+                    profiler.stop("ai", started)
+                started = profiler.start()
+                for _ in range(scheduler.advance()):
+                    update_game_state(tick_action(), scheduler.dt)
+                    if game_state != "playing":
+                        break
+                profiler.stop("logic", started)
+                current_piece_y_float = interpolated_piece_y(scheduler.alpha())
 
                 # Update score animation state
                 score_anim_active = False
@@ -964,9 +2110,7 @@ def main():
             # --- Drawing ---
             # Draw regardless of paused state, draw_window handles paused overlay
             draw_window(screen, grid, locked_blocks, current_piece, next_piece, score, level, lines_cleared_total, game_state, 0, score_anim_active)
-
-            # Update last_fall_time *after* all logic/drawing for this frame is done
-            last_fall_time = current_frame_start_time
+            profiler.stop("frame", frame_started) # Work only, clock.tick's wait is excluded
 
         elif game_state == "paused":
             # Drawing is handled by draw_window called from "playing" state check
@@ -974,8 +2118,8 @@ def main():
             for event in pygame.event.get(eventtype=pygame.KEYDOWN):
                 if event.key == pygame.K_p:
                     game_state = "playing"
-                    # IMPORTANT: Reset time anchor when unpausing to prevent huge delta_time jump
-                    last_fall_time = time.time()
+                    # IMPORTANT: Reset time anchor when unpausing so the pause is not caught up on
+                    scheduler.reset()
                 if event.key == pygame.K_q:
                     running = False
 
@@ -994,12 +2138,45 @@ def main():
                      running = False
 
         # --- Frame Rate Control ---
-        clock.tick(60) # Aim for 60 FPS
+        clock.tick(render_fps) # Drawing rate only; game speed comes from scheduler
 
     # --- Clean Up ---
+    if game_state != "start":
+        save_recording()
+    if sound_bank.thread is not None:
+        sound_bank.thread.join(timeout=1) # Don't pull the mixer out from under a load in progress
+    if profiler.enabled and profiler.phases:
+        save_trace()
     print("Exiting Pygame Tetris.")
     pygame.quit()
 
 # --- Run the Game ---
 if __name__ == "__main__":
-     main()
+    replay = None
+    if "--replay" in sys.argv: # --replay FILE: watch a recorded game, or verify it with --headless
+        replay = Replay.load(sys.argv[sys.argv.index("--replay") + 1])
+    if replay is not None and "--headless" in sys.argv: # Unthrottled re-run, checks for desyncs
+        start = time.perf_counter()
+        final, matched = replay.verify()
+        seconds = time.perf_counter() - start
+        print(f"{len(replay.step_times)} steps ({final.time:.0f}s of play) in {seconds:.2f}s, "
+              f"score {final.score}, lines {final.lines}: {'OK' if matched else 'DESYNC'}")
+        sys.exit(0 if matched else 1)
+    elif "--headless" in sys.argv: # Benchmark the rules without opening a window
+        if "--autoplay" in sys.argv: # Soak test: one AI game from level 15, up to an hour of game time
+            games, steps, seconds = run_headless(num_games=1, max_steps=60 * 60 * 60, player=AutoPlayer(), start_level=15)
+        else:
+            games, steps, seconds = run_headless()
+        print(f"{games} games, {steps} steps in {seconds:.2f}s ({steps / seconds:.0f} steps/s)")
+    elif "--batch" in sys.argv: # Greedy heuristic games on every core
+        games, placements, lines, total_score, seconds = run_batch_pool()
+        print(f"{games} games, {placements} placements, {lines} lines in {seconds:.2f}s "
+              f"({placements / seconds:.0f} placements/s)")
+    else:
+        options = {}
+        for flag, name in (("--fps", "render_fps"), ("--tick-rate", "logic_rate")): # e.g. --fps 144
+            if flag in sys.argv:
+                options[name] = int(sys.argv[sys.argv.index(flag) + 1])
+        if "--record" in sys.argv: # --record FILE: save each game as a replay, e.g. for a bug report
+            options["record"] = sys.argv[sys.argv.index("--record") + 1]
+        main(autoplay="--autoplay" in sys.argv, replay=replay, profile="--profile" in sys.argv, **options)
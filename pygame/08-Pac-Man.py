@@ -1,5 +1,9 @@
+# Optional procedural maze: python 08-Pac-Man.py COLS ROWS [SEED], e.g. 301 201
+import sys
 import pygame
 import random
+from pacman_env import (MAZE, DIRS, MazeNav, generate_maze, ghost_mode, ghost_starts, power_spots, PLAYER_START,
+                        PELLET_POINTS, POWER_POINTS, GHOST_POINTS, POWER_TICKS, GHOST_REST_EVERY, GHOST_RANDOM_TURN)
 
 pygame.init()
 
@@ -14,32 +18,131 @@ YELLOW = (255, 255, 0)
 RED = (255, 0, 0)
 WHITE = (255, 255, 255)
 
-maze = [
-    [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1],
-    [1,0,0,0,0,0,0,0,0,1,1,0,0,0,0,0,0,0,0,1],
-    [1,0,1,1,0,1,1,1,0,1,1,0,1,1,1,0,1,1,0,1],
-    [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
-    [1,0,1,1,0,1,0,1,1,1,1,1,1,0,1,0,1,1,0,1],
-    [1,0,0,0,0,1,0,0,0,1,1,0,0,0,1,0,0,0,0,1],
-    [1,1,1,1,0,1,1,1,0,1,1,0,1,1,1,0,1,1,1,1],
-    [1,0,0,1,0,1,0,0,0,0,0,0,0,0,1,0,1,0,0,1],
-    [1,1,1,1,0,1,0,1,1,1,1,1,1,0,1,0,1,1,1,1],
-    [1,0,0,0,0,0,0,1,0,0,0,0,1,0,0,0,0,0,0,1],
-    [1,0,1,1,0,1,1,1,0,1,1,0,1,1,1,0,1,1,0,1],
-    [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
-    [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1]
-]
-
-TILE_SIZE = 30
+maze = [row[:] for row in MAZE] # Eaten pellets are written back into the grid
+
+if len(sys.argv) >= 3:
+    maze = generate_maze(int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else None)
+
 ROWS = len(maze)
 COLS = len(maze[0])
 
-player_x, player_y = 1, 1
+# Cell codes: 0 pellet, 1 wall, 2 empty (eaten), 3 power pellet
+FRUIT_POINTS = 100
+FRUIT_AFTER = (70, 170) # Pellets eaten before each fruit appears, like the arcade
+FRUIT_TICKS = 10 * 8
+REGION_SIZE = 16 # Tiles per side of one pellet-index region
+
+class MazeState:
+    """Pellet bookkeeping for the maze, updated incrementally as things get eaten.
+
+    pellets_left counts pellets and power pellets, so win detection is a
+    comparison. region_pellets maps each REGION_SIZE square to the pellet
+    tiles left in it, which lets the fruit appear where pellets still are
+    without scanning the maze. Pellets walled off from start are cleared;
+    the default maze has two such pockets of 2 tiles each, 4 tiles in all.
+    """
+
+    def __init__(self, cells, start, power_spots=()):
+        self.cells = cells
+        rows, cols = len(cells), len(cells[0])
+        reachable = {start}
+        frontier = [start]
+        while frontier:
+            x, y = frontier.pop()
+            for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < cols and 0 <= ny < rows and cells[ny][nx] != 1 and (nx, ny) not in reachable:
+                    reachable.add((nx, ny))
+                    frontier.append((nx, ny))
+        for x, y in power_spots:
+            if (x, y) in reachable and cells[y][x] == 0:
+                cells[y][x] = 3
+
+        self.pellets_left = 0
+        self.eaten = 0
+        self.region_pellets = {}
+        for y, row in enumerate(cells):
+            for x, cell in enumerate(row):
+                if cell in (0, 3):
+                    if (x, y) not in reachable:
+                        row[x] = 2 # Sealed off, could never be eaten
+                        continue
+                    self.pellets_left += 1
+                    self.region_pellets.setdefault((x // REGION_SIZE, y // REGION_SIZE), set()).add((x, y))
+        self.fruit = None # (x, y) while a fruit is out
+        self.fruit_ticks = 0
+        self.fruits_shown = 0
+
+    def won(self):
+        return self.pellets_left == 0
+
+    def eat(self, x, y):
+        """Eats whatever is on (x, y); returns (points, what).
+
+        what is "pellet" or "power" when a pellet went (fruit points included
+        if the fruit sat on it), "fruit" for a fruit alone, otherwise None.
+        """
+        points, what = 0, None
+        if self.fruit == (x, y):
+            self.fruit = None
+            points, what = FRUIT_POINTS, "fruit"
+        cell = self.cells[y][x]
+        if cell in (0, 3):
+            self.cells[y][x] = 2
+            self.pellets_left -= 1
+            self.eaten += 1
+            region = self.region_pellets[(x // REGION_SIZE, y // REGION_SIZE)]
+            region.discard((x, y))
+            if not region:
+                del self.region_pellets[(x // REGION_SIZE, y // REGION_SIZE)]
+            points += POWER_POINTS if cell == 3 else PELLET_POINTS
+            what = "power" if cell == 3 else "pellet"
+            if self.fruits_shown < len(FRUIT_AFTER) and self.eaten == FRUIT_AFTER[self.fruits_shown]:
+                self.spawn_fruit()
+        return points, what
+
+    def spawn_fruit(self):
+        """Puts the fruit on a pellet in the region with the most pellets left."""
+        self.fruits_shown += 1
+        if self.region_pellets:
+            region = max(self.region_pellets.values(), key=len)
+            self.fruit = min(region) # Deterministic pick within the region
+            self.fruit_ticks = FRUIT_TICKS
+
+    def tick(self):
+        if self.fruit is not None:
+            self.fruit_ticks -= 1
+            if self.fruit_ticks <= 0:
+                self.fruit = None
+
+player_x, player_y = PLAYER_START
+state = MazeState(maze, (player_x, player_y), power_spots(COLS, ROWS))
+
+HUD_HEIGHT = 60
+TILE_SIZE = max(10, min(30, WIDTH // COLS, (HEIGHT - HUD_HEIGHT) // ROWS)) # Big mazes scroll instead
+PELLET_RADIUS = max(1, TILE_SIZE * 4 // 30)
+ACTOR_RADIUS = TILE_SIZE * 12 // 30
+
+# Walls and pellets are baked into one surface up front; eating a pellet erases
+# just that tile, so a frame is one blit of the visible part plus the actors.
+maze_surface = pygame.Surface((COLS * TILE_SIZE, ROWS * TILE_SIZE))
+for y, row in enumerate(maze):
+    for x, cell in enumerate(row):
+        if cell == 1:
+            pygame.draw.rect(maze_surface, BLUE, (x*TILE_SIZE, y*TILE_SIZE, TILE_SIZE, TILE_SIZE))
+        elif cell == 0:
+            pygame.draw.circle(maze_surface, YELLOW, (x*TILE_SIZE + TILE_SIZE//2, y*TILE_SIZE + TILE_SIZE//2), PELLET_RADIUS)
+        elif cell == 3:
+            pygame.draw.circle(maze_surface, YELLOW, (x*TILE_SIZE + TILE_SIZE//2, y*TILE_SIZE + TILE_SIZE//2), PELLET_RADIUS * 2 + 1)
+
+def erase_pellet(x, y):
+    maze_surface.fill(BLACK, (x*TILE_SIZE, y*TILE_SIZE, TILE_SIZE, TILE_SIZE))
+
 player_dir = (0, 0)
 next_dir = (0, 0) 
 
-ghosts = [[18, 1], [18, 11], [1, 11]] 
-ghost_dirs = [(0, 1), (0, -1), (1, 0)] 
+ghost_homes, ghost_dirs = ghost_starts(COLS, ROWS)
+ghosts = [list(home) for home in ghost_homes]
 
 score = 0
 font = pygame.font.Font(None, 36)
@@ -51,6 +154,46 @@ def can_move(x, y):
         return maze[y][x] != 1
     return False
 
+
+nav = None
+nav_version = -1
+maze_version = 0 # Bump whenever walls are added or removed; pellets don't count
+
+def get_nav():
+    """MazeNav for the current walls, rebuilt only after maze_version changed."""
+    global nav, nav_version
+    if nav_version != maze_version:
+        nav = MazeNav(maze)
+        nav_version = maze_version
+    return nav
+
+tick = 0
+power_ticks = 0 # Ticks left on the current power pellet
+FRIGHTENED = (100, 100, 255)
+FRUIT_COLOR = (255, 80, 160)
+
+def steer_ghost(i, mode):
+    """Picks ghost i's direction for this tick; only junctions and dead ends need a lookup."""
+    navigation = get_nav()
+    gx, gy = ghosts[i]
+    here = int(navigation.tile[gy, gx])
+    dx, dy = ghost_dirs[i]
+    if not navigation.junction[here] and can_move(gx + dx, gy + dy):
+        return # Corridor: keep going
+    if not navigation.junction[here]: # Corridor bend, take the only other exit
+        back = DIRS.index((dx, dy)) ^ 1
+        d = next(d for d in range(4) if d != back and navigation.neighbors[here, d] >= 0)
+    elif mode == "flee":
+        d = navigation.away(here, int(navigation.tile[player_y, player_x]))
+    elif random.random() < GHOST_RANDOM_TURN: # A little unpredictability at crossings
+        d = random.choice([d for d in range(4) if navigation.neighbors[here, d] >= 0])
+    else:
+        target = (player_x, player_y) if mode == "chase" else ghost_homes[i]
+        d = navigation.toward(here, int(navigation.tile[target[1], target[0]]))
+        if d < 0: # Target walled off from here
+            d = random.choice([d for d in range(4) if navigation.neighbors[here, d] >= 0])
+    ghost_dirs[i] = DIRS[d]
+
 running = True
 while running:
     for event in pygame.event.get():
@@ -78,55 +221,49 @@ while running:
         if can_move(new_x, new_y):
             player_x, player_y = new_x, new_y
 
-        if maze[player_y][player_x] == 0:
-            maze[player_y][player_x] = 2
-            score += 10
+        state.tick()
+        points, eaten = state.eat(player_x, player_y)
+        if eaten in ("pellet", "power"):
+            erase_pellet(player_x, player_y)
+        if eaten == "power":
+            power_ticks = POWER_TICKS
+        score += points
 
-        pellets_left = sum(row.count(0) for row in maze)
-        if pellets_left == 0:
+        if state.won():
             won = True
 
+        tick += 1
+        power_ticks = max(0, power_ticks - 1)
+        mode = "flee" if power_ticks else ghost_mode(tick)
         for i in range(len(ghosts)):
-            gx, gy = ghosts[i]
-            dx, dy = ghost_dirs[i]
-            
-            next_gx, next_gy = gx + dx, gy + dy
-
-            if not can_move(next_gx, next_gy):
-                possible_dirs = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-                random.shuffle(possible_dirs)
-                for pdx, pdy in possible_dirs:
-                    if can_move(gx + pdx, gy + pdy):
-                        ghost_dirs[i] = (pdx, pdy)
-                        break
-            else:
-                if random.random() < 0.1: 
-                     possible_dirs = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-                     valid_dirs = []
-                     for pdx, pdy in possible_dirs:
-                         if can_move(gx + pdx, gy + pdy):
-                             valid_dirs.append((pdx, pdy))
-                     ghost_dirs[i] = random.choice(valid_dirs)
-                
+            if tick % GHOST_REST_EVERY:
+                steer_ghost(i, mode)
                 ghosts[i][0] += ghost_dirs[i][0]
                 ghosts[i][1] += ghost_dirs[i][1]
 
             if player_x == ghosts[i][0] and player_y == ghosts[i][1]:
-                game_over = True
+                if power_ticks: # Eaten ghosts go back home
+                    score += GHOST_POINTS
+                    ghosts[i] = list(ghost_homes[i])
+                else:
+                    game_over = True
+
+    # Camera: keep the player centred when the maze is bigger than the window
+    view_w, view_h = WIDTH, HEIGHT - HUD_HEIGHT
+    cam_x = max(0, min(player_x*TILE_SIZE + TILE_SIZE//2 - view_w//2, maze_surface.get_width() - view_w))
+    cam_y = max(0, min(player_y*TILE_SIZE + TILE_SIZE//2 - view_h//2, maze_surface.get_height() - view_h))
 
     screen.fill(BLACK)
+    screen.blit(maze_surface, (0, 0), (cam_x, cam_y, view_w, view_h))
 
-    for y, row in enumerate(maze):
-        for x, cell in enumerate(row):
-            if cell == 1:
-                pygame.draw.rect(screen, BLUE, (x*TILE_SIZE, y*TILE_SIZE, TILE_SIZE, TILE_SIZE))
-            elif cell == 0:
-                pygame.draw.circle(screen, YELLOW, (x*TILE_SIZE + TILE_SIZE//2, y*TILE_SIZE + TILE_SIZE//2), 4)
+    pygame.draw.circle(screen, YELLOW, (player_x*TILE_SIZE + TILE_SIZE//2 - cam_x, player_y*TILE_SIZE + TILE_SIZE//2 - cam_y), ACTOR_RADIUS)
 
-    pygame.draw.circle(screen, YELLOW, (player_x*TILE_SIZE + TILE_SIZE//2, player_y*TILE_SIZE + TILE_SIZE//2), 12)
+    if state.fruit is not None:
+        fx, fy = state.fruit
+        pygame.draw.circle(screen, FRUIT_COLOR, (fx*TILE_SIZE + TILE_SIZE//2 - cam_x, fy*TILE_SIZE + TILE_SIZE//2 - cam_y), ACTOR_RADIUS * 2 // 3)
 
     for gx, gy in ghosts:
-        pygame.draw.circle(screen, RED, (gx*TILE_SIZE + TILE_SIZE//2, gy*TILE_SIZE + TILE_SIZE//2), 12)
+        pygame.draw.circle(screen, FRIGHTENED if power_ticks else RED, (gx*TILE_SIZE + TILE_SIZE//2 - cam_x, gy*TILE_SIZE + TILE_SIZE//2 - cam_y), ACTOR_RADIUS)
 
     score_text = font.render(f"Score: {score}", True, WHITE)
     screen.blit(score_text, (10, HEIGHT - 40))
@@ -1,30 +1,227 @@
 # Bouncing Ball Simulation Python
 # @Cod1ngTogether
+# Optional ball count: python bouncing_ball_simulation.py [NUM_BALLS], e.g. 10000
+import sys
+import math
 import pygame
-import random
+import numpy as np
 
 pygame.init()
 width, height = 400, 600
 screen = pygame.display.set_mode((width, height))
 clock = pygame.time.Clock()
 
-num_balls = 10
-balls = [
-    {
-        'x': random.uniform(20, width-20),
-        'y': 20,
-        'vx': random.uniform(-5, 5),
-        'vy': random.uniform(-5, 5),
-        'color': (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)),
-        'radius': 10,
-        'active': True
-    }
-    for _ in range(num_balls)
-]
+num_balls = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+# Shrink the balls when there are many, so they fill at most about a quarter of the window
+ball_radius = max(1, min(10, int(math.sqrt(width * height * 0.25 / (math.pi * max(num_balls, 1))))))
+
+# Every ball property is an array indexed by ball number, so a frame is a
+# handful of whole-array operations instead of a loop over dicts
+rng = np.random.default_rng()
+x = rng.uniform(20, width - 20, num_balls)
+# Dropped from the top; a crowd too big for one row starts spread over the upper half
+spread = 0 if num_balls * 2 * ball_radius <= width - 40 else height / 2
+y = 20 + rng.uniform(0, spread, num_balls)
+vx = rng.uniform(-5, 5, num_balls)
+vy = rng.uniform(-5, 5, num_balls)
+radius = np.full(num_balls, float(ball_radius))
+inv_mass = ball_radius ** 2 / radius ** 2 # Mass grows with area; a ball_radius ball weighs 1
+active = np.ones(num_balls, dtype=bool)
+still = np.zeros(num_balls, dtype=np.int32) # Frames each ball has stayed near its anchor while supported
+anchor_x, anchor_y = x.copy(), y.copy()
+colors = rng.integers(0, 256, (num_balls, 3))
+
 g = 0.5
 bounce_factor = 0.8
 velocity_threshold = 0.1
 friction = 0.99
+# Touching balls push each other apart like stiff springs. The spring is
+# integrated over a few substeps per frame; stiffer springs need more of them,
+# or piles start to jitter.
+substeps = 4
+stiffness = 4.0 # Push per pixel of overlap, in velocity per frame
+damping = 1.0 # Soaks up closing speed, so ball-ball hits lose energy like wall bounces
+contact_drag = 0.2 # Share of speed lost per frame while touching another ball, so piles settle
+wake_speed = 3.0 # A sleeping ball hit faster than this starts moving again
+rest_drift = 0.5 # Staying within this many radii of one spot, on the floor or on a settled ball, counts as resting
+rest_frames = 20 # Resting this long puts a ball to sleep, so piles freeze from the bottom up
+CELL_KEY = 1 << 20 # Cell key = column * CELL_KEY + row
+
+def move_balls(dt):
+    """Gravity, wall bounce and floor friction for every active ball, over dt frames."""
+    a = active
+    vy[a] += g * dt
+    x[a] += vx[a] * dt
+    y[a] += vy[a] * dt
+
+    side = a & (((x <= radius) & (vx < 0)) | ((x >= width - radius) & (vx > 0)))
+    vx[side] *= -bounce_factor
+    np.clip(x, radius, width - radius, out=x)
+
+    floor = a & (y >= height - radius)
+    y[floor] = height - radius[floor]
+    vy[floor & (vy > 0)] *= -bounce_factor
+    vx[floor] *= friction ** dt
+
+def find_pairs():
+    """Grid broad phase: (i, j) index arrays of balls in the same or neighbouring cells.
+
+    Cells are one ball diameter wide, so touching balls are at most one cell
+    apart. Balls are sorted by cell key, and each ball looks up its own cell
+    and four of its neighbours with searchsorted; the other four neighbours
+    are covered from the other side.
+    """
+    cell = 2 * float(radius.max())
+    keys = np.floor(x / cell).astype(np.int64) * CELL_KEY + np.floor(y / cell).astype(np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    balls = np.arange(len(keys))
+    firsts, seconds = [], []
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        target = keys + dx * CELL_KEY + dy
+        lo = np.searchsorted(keys, target, side="left")
+        counts = np.searchsorted(keys, target, side="right") - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        first = np.repeat(balls, counts)
+        second = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        if dx == dy == 0: # Same cell: each pair once, and no ball with itself
+            keep = second > first
+            first, second = first[keep], second[keep]
+        firsts.append(order[first])
+        seconds.append(order[second])
+    if not firsts:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+def push_apart(i, j, dt):
+    """Spring force between every overlapping candidate pair, summed per ball with bincount.
+
+    Sleeping balls do not move when pushed, unless hit harder than
+    wake_speed, which wakes them. Returns which balls lean on a settled ball
+    below, one that is asleep or was resting last frame.
+    """
+    dx, dy = x[j] - x[i], y[j] - y[i]
+    dist2 = dx * dx + dy * dy
+    reach = radius[i] + radius[j]
+    hit = dist2 < reach * reach
+    if not hit.any():
+        return np.zeros(num_balls, dtype=bool)
+    i, j, dx, dy, reach = i[hit], j[hit], dx[hit], dy[hit], reach[hit]
+    dist = np.sqrt(dist2[hit])
+    same = dist < 1e-9 # Exactly on top of each other, e.g. squeezed into a corner
+    if same.any(): # Push such pairs apart in varied made-up directions
+        angle = i[same] * 2.39996
+        dx[same], dy[same], dist[same] = np.cos(angle), np.sin(angle), 1
+    nx, ny = dx / dist, dy / dist
+
+    closing = (vx[j] - vx[i]) * nx + (vy[j] - vy[i]) * ny # Negative when approaching
+    woken = closing < -wake_speed
+    if woken.any():
+        active[i[woken]] = True
+        active[j[woken]] = True
+    force = np.maximum(stiffness * (reach - dist) - damping * closing, 0) * dt
+    n = num_balls
+    wi = active * inv_mass # Sleeping balls act as immovable
+    drag = np.ones(n)
+    drag[i] = drag[j] = (1 - contact_drag) ** dt
+    vx[:] = (vx + wi * (np.bincount(j, force * nx, n) - np.bincount(i, force * nx, n))) * drag
+    vy[:] = (vy + wi * (np.bincount(j, force * ny, n) - np.bincount(i, force * ny, n))) * drag
+
+    propped = np.zeros(n, dtype=bool)
+    settled = ~active | (still > 0) # Asleep, or resting since last frame
+    propped[i[settled[j] & (ny > 0)]] = True # j is settled and lower than i
+    propped[j[settled[i] & (ny < 0)]] = True
+    return propped
+
+def separate(i, j):
+    """Moves each awake ball out of the balls under it, one row at a time from the floor up.
+
+    A ball resting on another treats it as immovable and takes the whole overlap,
+    so each row holds up the next; balls side by side split it by inv_mass.
+    Closing speed along each contact is removed, so the pile does not spring back.
+    """
+    below = y[i] >= y[j]
+    lower, upper = np.where(below, i, j), np.where(below, j, i)
+    dx, dy = x[upper] - x[lower], y[upper] - y[lower]
+    reach = radius[lower] + radius[upper]
+    hit = active[upper] & (dx * dx + dy * dy < reach * reach)
+    if not hit.any():
+        return
+    lower, upper = lower[hit], upper[hit]
+    row = ((height - y[upper]) // radius.max()).astype(np.int64)
+    order = np.lexsort((upper, row)) # By row, then by ball, so each ball's pairs are one run
+    lower, upper, row = lower[order], upper[order], row[order]
+    row_starts = np.flatnonzero(np.diff(row)) + 1
+    ball_starts = np.concatenate(([0], np.flatnonzero((np.diff(row) != 0) | (np.diff(upper) != 0)) + 1))
+    for start, end in zip(np.concatenate(([0], row_starts)), np.concatenate((row_starts, [len(row)]))):
+        runs = ball_starts[np.searchsorted(ball_starts, start):np.searchsorted(ball_starts, end)] - start
+        lo, up = lower[start:end], upper[start:end]
+        dx, dy = x[up] - x[lo], y[up] - y[lo]
+        dist = np.sqrt(dx * dx + dy * dy)
+        same = dist < 1e-9 # Exactly on top of each other: lift the upper one straight up
+        dx[same], dy[same], dist[same] = 0, -1, 1
+        nx, ny = dx / dist, dy / dist
+        push = np.maximum(radius[lo] + radius[up] - dist, 0)
+        # Side by side, neither holds the other up: split the overlap by inverse mass
+        side = active[lo] & (ny > -0.5)
+        give = np.where(side, inv_mass[lo] / (inv_mass[lo] + inv_mass[up]), 0) * push
+        push -= give
+        closing = np.minimum((vx[up] - vx[lo]) * nx + (vy[up] - vy[lo]) * ny, 0)
+        balls = up[runs]
+        shares = np.diff(np.append(runs, len(up))) # Pairs per ball, so pushes are averaged
+        x[balls] += np.add.reduceat(nx * push, runs) / shares
+        y[balls] += np.add.reduceat(ny * push, runs) / shares
+        np.subtract.at(x, lo[side], (nx * give)[side])
+        np.subtract.at(y, lo[side], (ny * give)[side])
+        vx[balls] -= np.add.reduceat(nx * closing, runs) / shares
+        vy[balls] -= np.add.reduceat(ny * closing, runs) / shares
+    np.clip(x, radius, width - radius, out=x)
+    np.minimum(y, height - radius, out=y)
+
+def step_balls():
+    """One frame: substeps of motion, contact forces and separation, then the sleep check.
+
+    Candidate pairs come from one broad phase per frame and exclude pairs of
+    sleeping balls and pairs too far apart to meet before the next one.
+    A ball sleeps, as before, when it sits on the floor moving
+    slower than velocity_threshold, or after rest_frames of resting on the
+    floor or on settled balls.
+    """
+    if not active.any(): # Nothing left to wake anything, including when there are no balls
+        return
+    i, j = find_pairs()
+    # Only pairs that are awake and close enough to touch within this frame
+    gap = np.hypot(x[j] - x[i], y[j] - y[i]) - radius[i] - radius[j]
+    keep = (active[i] | active[j]) & (gap < radius.max())
+    i, j = i[keep], j[keep]
+    dt = 1 / substeps
+    propped = np.zeros(num_balls, dtype=bool)
+    for _ in range(substeps):
+        move_balls(dt)
+        propped |= push_apart(i, j, dt)
+        separate(i, j)
+
+    floor = active & (y >= height - radius)
+    sleep = floor & (np.abs(vy) < velocity_threshold) & (np.abs(vx) < velocity_threshold)
+    # Springs keep resting balls jiggling, so resting is judged by drift, not speed
+    grounded = y >= height - radius * (1 + rest_drift)
+    resting = active & (grounded | propped) & ((x - anchor_x) ** 2 + (y - anchor_y) ** 2 < (rest_drift * radius) ** 2)
+    anchor_x[~resting], anchor_y[~resting] = x[~resting], y[~resting]
+    still[:] = np.where(resting, still + 1, 0)
+    sleep |= still >= rest_frames
+    active[sleep] = False
+    vx[sleep] = 0
+    vy[sleep] = 0
+    still[sleep] = 0
+
+# One pre-drawn sprite per ball, so drawing is a single blits() call
+sprites = []
+for color in colors.tolist():
+    sprite = pygame.Surface((2 * ball_radius, 2 * ball_radius), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, color, (ball_radius, ball_radius), ball_radius)
+    sprites.append(sprite)
 
 running = True
 while running:
@@ -32,30 +229,11 @@ while running:
         if event.type == pygame.QUIT:
             running = False
 
-    for ball in balls:
-        if not ball['active']:
-            continue
-
-        ball['vy'] += g
-        ball['x'] += ball['vx']
-        ball['y'] += ball['vy']
-
-        if ball['x'] <= ball['radius'] or ball['x'] >= width - ball['radius']:
-            ball['vx'] *= -bounce_factor
-            ball['x'] = max(ball['radius'], min(width - ball['radius'], ball['x']))
-
-        if ball['y'] >= height - ball['radius']:
-            ball['y'] = height - ball['radius']
-            ball['vy'] *= -bounce_factor
-            ball['vx'] *= friction
-            if abs(ball['vy']) < velocity_threshold and abs(ball['vx']) < velocity_threshold:
-                ball['active'] = False
-                ball['vx'] = 0
-                ball['vy'] = 0
+    step_balls()
 
     screen.fill((0, 0, 0))
-    for ball in balls:
-        pygame.draw.circle(screen, ball['color'], (int(ball['x']), int(ball['y'])), ball['radius'])
+    corners = zip((x - radius).astype(int).tolist(), (y - radius).astype(int).tolist())
+    screen.blits(list(zip(sprites, corners)), doreturn=False)
     pygame.display.flip()
     clock.tick(60)
 
@@ -1,32 +1,17 @@
 # Simple Pong Game in Python
+import os
+import sys
 import pygame
-import math
-import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)) # arcade_env.py is in the repo root
+from arcade_env import PongState, step_pong, PONG_WIDTH, PONG_HEIGHT, LEFT_UP, LEFT_DOWN, RIGHT_UP, RIGHT_DOWN
 
 # Constants
 # Screen
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
-
-# Paddles
-LEFT_PADDLE_X = 50
-LEFT_PADDLE_Y = 250
-RIGHT_PADDLE_X = 730
-RIGHT_PADDLE_Y = 250
-PADDLE_WIDTH = 20
-PADDLE_HEIGHT = 100
-PADDLE_SPEED = 5
+SCREEN_WIDTH = PONG_WIDTH
+SCREEN_HEIGHT = PONG_HEIGHT
 
-# Ball
-BALL_INIT_X = 390
-BALL_INIT_Y = 290
-BALL_RESET_X = 400
-BALL_RESET_Y = 300
-BALL_SIZE = 20
-BALL_BASE_SPEED = 5
-BALL_ANGLE_MIN = -math.pi / 4  # -45 degrees
-BALL_ANGLE_MAX = math.pi / 4   # +45 degrees
-BALL_SPEED_MULTIPLIER = 1.1
+# Paddle and ball sizes, speeds and serve angles are rules, kept in arcade_env.py
 
 # Score display
 FONT_SIZE = 36
@@ -48,26 +33,10 @@ screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Pong")
 clock = pygame.time.Clock()
 
-# Define paddles (left and right)
-left_paddle = pygame.Rect(LEFT_PADDLE_X, LEFT_PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT)
-right_paddle = pygame.Rect(RIGHT_PADDLE_X, RIGHT_PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT)
-
-# Define ball
-ball = pygame.Rect(BALL_INIT_X, BALL_INIT_Y, BALL_SIZE, BALL_SIZE)
-ball_speed = [0, 0]  # [x speed, y speed]
-
-# Score
-score = [0, 0]  # [left player, right player]
+# Paddles, ball and score [left player, right player]; the rules are in arcade_env.py
+state = PongState()
 font = pygame.font.Font(None, FONT_SIZE)
 
-# Function to reset the ball
-def reset_ball():
-    ball.center = (BALL_RESET_X, BALL_RESET_Y)
-    angle = random.uniform(BALL_ANGLE_MIN, BALL_ANGLE_MAX)
-    direction = random.choice([-1, 1])
-    ball_speed[0] = direction * BALL_BASE_SPEED * math.cos(angle)
-    ball_speed[1] = BALL_BASE_SPEED * math.sin(angle)
-
 # Game loop
 running = True
 while running:
@@ -77,48 +46,27 @@ while running:
 
     # Player controls
     keys = pygame.key.get_pressed()
+    action = 0
     # Left paddle (Player 1: W and S)
-    if keys[pygame.K_w] and left_paddle.top > 0:
-        left_paddle.y -= PADDLE_SPEED
-    if keys[pygame.K_s] and left_paddle.bottom < SCREEN_HEIGHT:
-        left_paddle.y += PADDLE_SPEED
+    if keys[pygame.K_w]:
+        action |= LEFT_UP
+    if keys[pygame.K_s]:
+        action |= LEFT_DOWN
     # Right paddle (Player 2: Arrow keys)
-    if keys[pygame.K_UP] and right_paddle.top > 0:
-        right_paddle.y -= PADDLE_SPEED
-    if keys[pygame.K_DOWN] and right_paddle.bottom < SCREEN_HEIGHT:
-        right_paddle.y += PADDLE_SPEED
-
-    # Start ball if stationary
-    if ball_speed == [0, 0]:
-        reset_ball()
-
-    # Move ball
-    ball.x += ball_speed[0]
-    ball.y += ball_speed[1]
-
-    # Bounce off top and bottom walls
-    if ball.top <= 0 or ball.bottom >= SCREEN_HEIGHT:
-        ball_speed[1] = -ball_speed[1]
-
-    # Bounce off paddles and increase speed
-    if ball.colliderect(left_paddle) or ball.colliderect(right_paddle):
-        ball_speed[0] = -ball_speed[0] * BALL_SPEED_MULTIPLIER
-        ball_speed[1] *= BALL_SPEED_MULTIPLIER
+    if keys[pygame.K_UP]:
+        action |= RIGHT_UP
+    if keys[pygame.K_DOWN]:
+        action |= RIGHT_DOWN
 
-    # Score points and reset ball
-    if ball.left <= 0:
-        score[1] += 1  # Right player scores
-        reset_ball()
-    if ball.right >= SCREEN_WIDTH:
-        score[0] += 1  # Left player scores
-        reset_ball()
+    # Move paddles and ball, bounce and score
+    step_pong(state, action)
 
     # Draw everything
     screen.fill(COLOR_BLACK)
-    pygame.draw.rect(screen, COLOR_GREEN, left_paddle)
-    pygame.draw.rect(screen, COLOR_GREEN, right_paddle)
-    pygame.draw.ellipse(screen, COLOR_RED, ball)
-    score_text = font.render(f"{score[0]} - {score[1]}", True, COLOR_WHITE)
+    pygame.draw.rect(screen, COLOR_GREEN, state.left_paddle)
+    pygame.draw.rect(screen, COLOR_GREEN, state.right_paddle)
+    pygame.draw.ellipse(screen, COLOR_RED, state.ball)
+    score_text = font.render(f"{state.score[0]} - {state.score[1]}", True, COLOR_WHITE)
     screen.blit(score_text, (SCORE_TEXT_X, SCORE_TEXT_Y))
     pygame.display.flip()
 
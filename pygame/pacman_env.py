@@ -0,0 +1,414 @@
+# Pac-Man rules without pygame: the maze, ghost navigation and BatchPacMan,
+# a vectorised environment that steps many games at once for training agents.
+# 08-Pac-Man.py imports the shared parts from here.
+# Benchmark: python pacman_env.py [GAMES] [STEPS] [--workers N]
+import os
+import sys
+import time
+import random
+import numpy as np
+
+MAZE = [ # The classic layout: 1 wall, 0 pellet
+    [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1],
+    [1,0,0,0,0,0,0,0,0,1,1,0,0,0,0,0,0,0,0,1],
+    [1,0,1,1,0,1,1,1,0,1,1,0,1,1,1,0,1,1,0,1],
+    [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+    [1,0,1,1,0,1,0,1,1,1,1,1,1,0,1,0,1,1,0,1],
+    [1,0,0,0,0,1,0,0,0,1,1,0,0,0,1,0,0,0,0,1],
+    [1,1,1,1,0,1,1,1,0,1,1,0,1,1,1,0,1,1,1,1],
+    [1,0,0,1,0,1,0,0,0,0,0,0,0,0,1,0,1,0,0,1],
+    [1,1,1,1,0,1,0,1,1,1,1,1,1,0,1,0,1,1,1,1],
+    [1,0,0,0,0,0,0,1,0,0,0,0,1,0,0,0,0,0,0,1],
+    [1,0,1,1,0,1,1,1,0,1,1,0,1,1,1,0,1,1,0,1],
+    [1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1],
+    [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1]
+]
+
+def generate_maze(cols, rows, seed=None):
+    """Random braided maze of 1 (wall) / 0 (pellet) cells; odd (x, y) cells are always open.
+
+    A depth-first carve gives a perfect maze, then most dead ends are knocked
+    through so there are loops to run around like in the original layout.
+    """
+    rng = random.Random(seed)
+    cols -= 1 - cols % 2 # Need odd sizes so the border is wall
+    rows -= 1 - rows % 2
+    grid = [[1] * cols for _ in range(rows)]
+    grid[1][1] = 0
+    stack = [(1, 1)]
+    while stack:
+        x, y = stack[-1]
+        options = [(dx, dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                   if 0 < x + dx < cols - 1 and 0 < y + dy < rows - 1 and grid[y + dy][x + dx]]
+        if not options:
+            stack.pop()
+            continue
+        dx, dy = rng.choice(options)
+        grid[y + dy // 2][x + dx // 2] = 0
+        grid[y + dy][x + dx] = 0
+        stack.append((x + dx, y + dy))
+    for y in range(1, rows - 1, 2):
+        for x in range(1, cols - 1, 2):
+            walls = [(dx, dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                     if grid[y + dy][x + dx] and 0 < x + 2 * dx < cols - 1 and 0 < y + 2 * dy < rows - 1]
+            if len(walls) == 3 and rng.random() < 0.8: # Dead end, open it up
+                dx, dy = rng.choice(walls)
+                grid[y + dy][x + dx] = 0
+    return grid
+
+# --- Rules ---
+PELLET_POINTS = 10
+POWER_POINTS = 50
+GHOST_POINTS = 200
+POWER_TICKS = 6 * 8 # Ghosts flee and can be eaten for 6 s at 8 FPS
+# Ghost behaviour cycles like the arcade: scatter to their home corners, then chase
+SCATTER_TICKS = 7 * 8 # 7 s at 8 FPS
+CHASE_TICKS = 20 * 8
+GHOST_REST_EVERY = 5 # Ghosts sit out every 5th tick so a chase can be outrun
+GHOST_RANDOM_TURN = 0.1 # Chance of a random turn at a crossing, outside flee mode
+PLAYER_START = (1, 1)
+
+def ghost_mode(tick):
+    return "scatter" if tick % (SCATTER_TICKS + CHASE_TICKS) < SCATTER_TICKS else "chase"
+
+def ghost_starts(cols, rows):
+    """Ghost home tiles, the three corners the player does not start in, and their first directions."""
+    return [(cols - 2, 1), (cols - 2, rows - 2), (1, rows - 2)], [(0, 1), (0, -1), (1, 0)]
+
+def power_spots(cols, rows):
+    """Power pellets go near the four corners, as in the arcade maze."""
+    return [(1, 3), (cols - 2, 3), (1, rows - 4), (cols - 2, rows - 4)]
+
+# --- Navigation ---
+# Walkable tiles are numbered 0..N-1 and every table below is a NumPy array
+# indexed by those numbers, so a ghost's move is a couple of array lookups.
+DIRS = [(0, 1), (0, -1), (1, 0), (-1, 0)] # Index = direction id used in the tables
+ALL_PAIRS_LIMIT = 1024 # Up to this many tiles, every BFS distance/next hop is precomputed
+FIELD_CACHE_LIMIT = 64 # Bigger mazes keep this many per-target distance fields
+
+class MazeNav:
+    """Junction graph plus BFS distance and next-hop lookups for one wall layout.
+
+    tile[y, x] is the tile number (-1 for walls), neighbors[t, d] the tile one
+    step in DIRS[d] (-1 if blocked). Junctions are tiles where a ghost has a
+    real choice (three or more exits, or a dead end); junction_edges lists,
+    per junction, the (direction, junction reached, corridor length) triples.
+    Small mazes get full N x N distance and next-direction tables; large ones
+    compute a distance field per target on demand and cache the recent ones,
+    so dozens of ghosts chasing the same tile share one BFS.
+    """
+
+    def __init__(self, maze):
+        walls = np.array(maze) == 1
+        self.tile = np.full(walls.shape, -1, dtype=np.int32)
+        ys, xs = np.nonzero(~walls)
+        self.tile[ys, xs] = np.arange(len(ys))
+        self.positions = np.column_stack((xs, ys)).astype(np.int32)
+        self.neighbors = np.full((len(ys), 4), -1, dtype=np.int32)
+        padded = np.pad(self.tile, 1, constant_values=-1)
+        for d, (dx, dy) in enumerate(DIRS):
+            self.neighbors[:, d] = padded[ys + 1 + dy, xs + 1 + dx]
+
+        exits = (self.neighbors >= 0).sum(axis=1)
+        self.junction = (exits >= 3) | (exits == 1)
+        self.junction_edges = {}
+        for j in np.nonzero(self.junction)[0]:
+            self.junction_edges[int(j)] = [self.follow_corridor(int(j), d) for d in range(4) if self.neighbors[j, d] >= 0]
+
+        self.fields = {}
+        self.dist = self.next_dir_table = None
+        if len(ys) <= ALL_PAIRS_LIMIT:
+            self.build_all_pairs()
+
+    def follow_corridor(self, start, d):
+        """Walks from a junction until the next one; returns (direction, junction, length)."""
+        tile, heading, length = int(self.neighbors[start, d]), d, 1
+        while not self.junction[tile]:
+            back = heading ^ 1 # DIRS pairs up opposites: 0/1 and 2/3
+            heading = next(k for k in range(4) if k != back and self.neighbors[tile, k] >= 0)
+            tile = int(self.neighbors[tile, heading])
+            length += 1
+            if tile == start: # A loop with no other junction on it
+                break
+        return d, tile, length
+
+    def bfs(self, sources):
+        """Distances from every tile in sources to all tiles (-1 where unreachable)."""
+        dist = np.full(len(self.positions), -1, dtype=np.int32)
+        frontier = np.asarray(sources, dtype=np.int32)
+        dist[frontier] = 0
+        step = 0
+        while frontier.size:
+            step += 1
+            reached = self.neighbors[frontier].ravel()
+            reached = np.unique(reached[reached >= 0])
+            frontier = reached[dist[reached] < 0]
+            dist[frontier] = step
+        return dist
+
+    def build_all_pairs(self):
+        n = len(self.positions)
+        self.dist = np.stack([self.bfs([t]) for t in range(n)]) # dist[target, tile]
+        # Best direction from tile toward target: the neighbour one step closer
+        nb_dist = np.where(self.neighbors >= 0, self.dist[:, self.neighbors], np.iinfo(np.int32).max) # (target, tile, 4)
+        nb_dist[nb_dist < 0] = np.iinfo(np.int32).max
+        best = np.argmin(nb_dist, axis=2).astype(np.int8)
+        # -1 where no neighbour reaches the target, like toward() on the field path
+        best[np.take_along_axis(nb_dist, best[..., None].astype(np.intp), axis=2)[..., 0] == np.iinfo(np.int32).max] = -1
+        self.next_dir_table = best # next_dir_table[target, tile]
+
+    def field(self, target):
+        """BFS distance from every tile to target."""
+        if self.dist is not None:
+            return self.dist[target]
+        field = self.fields.pop(target, None)
+        if field is None:
+            if len(self.fields) >= FIELD_CACHE_LIMIT:
+                self.fields.pop(next(iter(self.fields))) # Oldest first
+            field = self.bfs([target])
+        self.fields[target] = field # Re-insert as most recent
+        return field
+
+    def toward(self, tile, target):
+        """Direction id of the first step on a shortest path from tile to target, -1 if there is none."""
+        if self.next_dir_table is not None:
+            return int(self.next_dir_table[target, tile])
+        field = self.field(target)
+        best, best_d = -1, -1
+        for d in range(4):
+            nb = self.neighbors[tile, d]
+            if nb >= 0 and field[nb] >= 0 and (best < 0 or field[nb] < best):
+                best, best_d = field[nb], d
+        return best_d
+
+    def away(self, tile, threat):
+        """Direction id leading to the exit whose next junction is farthest from threat."""
+        field = self.field(threat)
+        if self.junction[tile]:
+            d, _, _ = max(self.junction_edges[tile], key=lambda edge: field[edge[1]])
+            return d
+        return max((d for d in range(4) if self.neighbors[tile, d] >= 0), key=lambda d: field[self.neighbors[tile, d]])
+
+# --- Batch Environment ---
+# BatchPacMan keeps every game's state in NumPy arrays indexed by MazeNav tile
+# numbers: player and ghost tiles and directions, and an (N, tiles) pellet map.
+# One step() moves all games with the same rules as 08-Pac-Man.py, using the
+# all-pairs tables for ghost steering, so mazes are limited to ALL_PAIRS_LIMIT
+# open tiles. Finished games are reset automatically, like a gym vector env.
+EMPTY, PELLET, POWER = 0, 1, 2 # Pellet map values
+ACTION_NONE = 4 # Keep the queued direction; 0..3 queue DIRS[action], like the arrow keys
+OBS_PLANES = 4 # Walls, pellets (1 pellet, 2 power), player, ghosts (1, or 2 while frightened)
+
+class BatchPacMan:
+    """num_games independent Pac-Man games on one maze, stepped together.
+
+    step(actions) takes one action per game and returns (observations,
+    rewards, done, info); rewards are the points scored that step. Pass
+    ghost_actions (num_games, 3) to steer the ghosts as extra agents: a
+    direction id is used at junctions where it is open, -1 leaves the ghost
+    to the built-in chase/scatter/flee logic. Fruit is left out.
+    """
+
+    def __init__(self, maze, num_games, seed=None, max_steps=None):
+        self.nav = nav = MazeNav(maze)
+        if nav.dist is None:
+            raise ValueError(f"BatchPacMan needs a maze with at most {ALL_PAIRS_LIMIT} open tiles")
+        self.rows, self.cols = len(maze), len(maze[0])
+        self.num_games = num_games
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        num_tiles = len(nav.positions)
+
+        self.start = int(nav.tile[PLAYER_START[1], PLAYER_START[0]])
+        homes, home_dirs = ghost_starts(self.cols, self.rows)
+        self.homes = np.array([nav.tile[y, x] for x, y in homes], dtype=np.int32)
+        if self.start < 0 or (self.homes < 0).any():
+            raise ValueError("The player start and ghost corners must be open tiles")
+        self.home_dirs = np.array([DIRS.index(d) for d in home_dirs], dtype=np.int8)
+
+        # Pellets the player can reach, with power pellets where the game puts them
+        cells = np.array(maze)[nav.positions[:, 1], nav.positions[:, 0]]
+        self.initial_pellets = np.where((cells == 0) & (nav.dist[self.start] >= 0), PELLET, EMPTY).astype(np.uint8)
+        for x, y in power_spots(self.cols, self.rows):
+            t = nav.tile[y, x] if 0 <= x < self.cols and 0 <= y < self.rows else -1
+            if t >= 0 and self.initial_pellets[t] == PELLET:
+                self.initial_pellets[t] = POWER
+        self.initial_count = int(np.count_nonzero(self.initial_pellets))
+
+        # A fifth "direction" that stays put, so ACTION_NONE needs no special case
+        self.moves = np.column_stack((nav.neighbors, np.arange(num_tiles, dtype=np.int32)))
+        # Direction a ghost takes in a corridor: straight on, or round the bend
+        self.corridor = np.tile(np.arange(4, dtype=np.int8), (num_tiles, 1))
+        # Junction a ghost reaches by leaving each junction in each direction
+        self.edge_end = np.full((num_tiles, 4), -1, dtype=np.int32)
+        for t in range(num_tiles):
+            if nav.junction[t]:
+                for d, end, _length in nav.junction_edges[t]:
+                    self.edge_end[t, d] = end
+                continue
+            for d in range(4):
+                if nav.neighbors[t, d] < 0:
+                    self.corridor[t, d] = next(k for k in range(4) if k != d ^ 1 and nav.neighbors[t, k] >= 0)
+
+        self.flat_tiles = nav.positions[:, 1] * self.cols + nav.positions[:, 0] # Tile -> index in a flattened plane
+        self.walls = (np.array(maze) == 1).astype(np.uint8)
+        self.reset()
+
+    def reset(self, mask=None):
+        """Restarts every game, or only those where mask is True; returns the observations."""
+        if mask is None:
+            n = self.num_games
+            self.player = np.full(n, self.start, dtype=np.int32)
+            self.player_dir = np.full(n, ACTION_NONE, dtype=np.int8)
+            self.next_dir = np.full(n, ACTION_NONE, dtype=np.int8)
+            self.ghosts = np.tile(self.homes, (n, 1))
+            self.ghost_dirs = np.tile(self.home_dirs, (n, 1))
+            self.pellets = np.tile(self.initial_pellets, (n, 1))
+            self.pellets_left = np.full(n, self.initial_count, dtype=np.int32)
+            self.score = np.zeros(n, dtype=np.int64)
+            self.power_ticks = np.zeros(n, dtype=np.int32)
+            self.tick = np.zeros(n, dtype=np.int64)
+        else:
+            self.player[mask] = self.start
+            self.player_dir[mask] = ACTION_NONE
+            self.next_dir[mask] = ACTION_NONE
+            self.ghosts[mask] = self.homes
+            self.ghost_dirs[mask] = self.home_dirs
+            self.pellets[mask] = self.initial_pellets
+            self.pellets_left[mask] = self.initial_count
+            self.score[mask] = 0
+            self.power_ticks[mask] = 0
+            self.tick[mask] = 0
+        return self.observe()
+
+    def observe(self):
+        """(N, OBS_PLANES, rows, cols) uint8 planes describing every game."""
+        n, plane = self.num_games, self.rows * self.cols
+        obs = np.zeros((n, OBS_PLANES, plane), dtype=np.uint8)
+        obs[:, 0] = self.walls.ravel()
+        obs[:, 1, self.flat_tiles] = self.pellets
+        games = np.arange(n)
+        obs[games, 2, self.flat_tiles[self.player]] = 1
+        obs[games[:, None], 3, self.flat_tiles[self.ghosts]] = np.where(self.power_ticks > 0, 2, 1)[:, None]
+        return obs.reshape(n, OBS_PLANES, self.rows, self.cols)
+
+    def steer_ghosts(self, frightened, ghost_actions):
+        """Direction id for every ghost this tick, as steer_ghost() picks it in the game."""
+        nav, here, heading = self.nav, self.ghosts, self.ghost_dirs
+        directions = self.corridor[here, heading]
+        at_junction = nav.junction[here]
+        if not at_junction.any():
+            return directions
+
+        # Chase the player or scatter home, with the odd random turn
+        scatter = self.tick % (SCATTER_TICKS + CHASE_TICKS) < SCATTER_TICKS
+        target = np.where(scatter[:, None], self.homes, self.player[:, None])
+        toward = nav.next_dir_table[target, here]
+        reachable = toward >= 0
+        open_exits = nav.neighbors[here] >= 0 # (N, G, 4)
+        keys = self.rng.random(open_exits.shape)
+        keys[~open_exits] = -1
+        random_turn = keys.argmax(axis=-1)
+        turn = (self.rng.random(here.shape) < GHOST_RANDOM_TURN) | ~reachable
+        chosen = np.where(turn, random_turn, toward)
+
+        # Flee: the exit whose next junction is farthest from the player
+        ends = self.edge_end[here] # (N, G, 4)
+        away = np.where(ends >= 0, nav.dist[self.player[:, None, None], ends], -1).argmax(axis=-1)
+        chosen = np.where(frightened[:, None], away, chosen)
+
+        if ghost_actions is not None:
+            ghost_actions = np.asarray(ghost_actions)
+            wanted = np.clip(ghost_actions, 0, 3)
+            usable = (ghost_actions >= 0) & np.take_along_axis(open_exits, wanted[..., None], axis=-1)[..., 0]
+            chosen = np.where(usable, wanted, chosen)
+        return np.where(at_junction, chosen, directions).astype(np.int8)
+
+    def step(self, actions, ghost_actions=None):
+        """Advances every game by one tick; returns (observations, rewards, done, info).
+
+        info holds "won" and "score" (the final score of games that just
+        ended). Games that end are reset before the observations are taken.
+        """
+        actions = np.asarray(actions)
+        queued = actions < ACTION_NONE
+        self.next_dir[queued] = actions[queued]
+        games = np.arange(self.num_games)
+
+        # Turn when the queued direction is open, then move if the way is clear
+        turn = self.moves[self.player, self.next_dir] >= 0
+        self.player_dir = np.where(turn, self.next_dir, self.player_dir)
+        ahead = self.moves[self.player, self.player_dir]
+        self.player = np.where(ahead >= 0, ahead, self.player)
+
+        eaten = self.pellets[games, self.player]
+        rewards = np.where(eaten == PELLET, PELLET_POINTS, np.where(eaten == POWER, POWER_POINTS, 0))
+        self.pellets[games, self.player] = EMPTY
+        self.pellets_left -= eaten != EMPTY
+        self.power_ticks = np.where(eaten == POWER, POWER_TICKS, self.power_ticks)
+        won = self.pellets_left == 0
+
+        self.tick += 1
+        self.power_ticks = np.maximum(0, self.power_ticks - 1)
+        frightened = self.power_ticks > 0
+        moving = (self.tick % GHOST_REST_EVERY != 0)[:, None]
+        directions = self.steer_ghosts(frightened, ghost_actions)
+        self.ghost_dirs = np.where(moving, directions, self.ghost_dirs)
+        self.ghosts = np.where(moving, self.moves[self.ghosts, self.ghost_dirs], self.ghosts)
+
+        hit = self.ghosts == self.player[:, None]
+        caught = hit & frightened[:, None] # Eaten ghosts go back home
+        rewards = rewards + GHOST_POINTS * caught.sum(axis=1)
+        self.ghosts = np.where(caught, self.homes, self.ghosts)
+        lost = (hit & ~frightened[:, None]).any(axis=1)
+
+        self.score += rewards
+        done = won | lost
+        if self.max_steps is not None:
+            done |= self.tick >= self.max_steps
+        info = {"won": won, "score": np.where(done, self.score, 0)}
+        if done.any():
+            self.reset(done)
+        return self.observe(), rewards, done, info
+
+def run_batch(args):
+    """Process-pool worker: random play; returns (steps, games finished, their score, games won)."""
+    maze, num_games, steps, seed = args
+    env = BatchPacMan(maze, num_games, seed)
+    rng = np.random.default_rng(seed)
+    finished = total_score = wins = 0
+    for _ in range(steps):
+        _obs, _rewards, done, info = env.step(rng.integers(0, ACTION_NONE + 1, num_games))
+        finished += int(done.sum())
+        total_score += int(info["score"].sum())
+        wins += int(info["won"].sum())
+    return num_games * steps, finished, total_score, wins
+
+def run_batch_pool(maze=MAZE, total_games=4096, batch_size=512, steps=1000, seed=0, workers=None):
+    """Spreads batches across a process pool (one worker per core by default).
+
+    Returns (steps, games finished, their score, games won, seconds) summed over all batches.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = []
+    for i, start in enumerate(range(0, total_games, batch_size)):
+        jobs.append((maze, min(batch_size, total_games - start), steps, seed + i))
+
+    begin = time.perf_counter()
+    totals = [0, 0, 0, 0]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for result in pool.map(run_batch, jobs):
+            totals = [t + r for t, r in zip(totals, result)]
+    return tuple(totals) + (time.perf_counter() - begin,)
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+    if workers is not None:
+        args.remove(str(workers))
+    games = int(args[0]) if args else 4096
+    steps = int(args[1]) if len(args) > 1 else 1000
+    total, finished, score, wins, seconds = run_batch_pool(total_games=games, steps=steps, workers=workers)
+    print(f"{games} games, {total} steps in {seconds:.2f}s ({total / seconds:.0f} steps/s), "
+          f"{finished} finished, {wins} won, average score {score / max(finished, 1):.0f}")
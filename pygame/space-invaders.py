@@ -1,26 +1,181 @@
 # Simple Space Invaders Game in Python
 # @CodingTogether
 import pygame
-import random
+import numpy as np
 
 pygame.init()
 screen = pygame.display.set_mode((800, 600))
 clock = pygame.time.Clock()
+rng = np.random.default_rng()
+CELL_SIZE = 64 # Spatial hash cell: an enemy covers at most 2x2 cells, a bullet 1 or 2
+FIRE_CHANCE = 0.005 # Per enemy per frame
+
+class EntityPool:
+    """Structure-of-arrays store for one kind of same-sized entity.
+
+    x, y, vx, vy and alive are parallel NumPy arrays. spawn() reuses dead
+    slots and kill() only clears alive, so no bullet is allocated or freed
+    while playing; the arrays double when every slot is taken.
+    """
+
+    def __init__(self, width, height, capacity=64):
+        self.width, self.height = width, height
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.vx = np.zeros(capacity, dtype=np.int32)
+        self.vy = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def grow(self):
+        for name in ("x", "y", "vx", "vy", "alive"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+
+    def spawn(self, x, y, vx=0, vy=0):
+        """Fills free slots with new entities (scalars or arrays); returns the slots."""
+        x, y = np.atleast_1d(x), np.atleast_1d(y)
+        free = np.flatnonzero(~self.alive)
+        while len(free) < len(x):
+            self.grow()
+            free = np.flatnonzero(~self.alive)
+        slots = free[:len(x)]
+        self.x[slots], self.y[slots], self.vx[slots], self.vy[slots] = x, y, vx, vy
+        self.alive[slots] = True
+        return slots
+
+    def kill(self, slots):
+        self.alive[slots] = False
+
+    def clear(self):
+        self.alive[:] = False
+
+    def live(self):
+        return np.flatnonzero(self.alive)
+
+    def move(self):
+        np.add(self.x, self.vx, out=self.x, where=self.alive)
+        np.add(self.y, self.vy, out=self.y, where=self.alive)
+
+    def cull(self, top, bottom):
+        """Kills everything entirely above top or below bottom."""
+        self.alive &= (self.y + self.height >= top) & (self.y <= bottom)
+
+    def rects(self):
+        """(x, y, w, h) tuples of the live entities, for drawing."""
+        live = self.live()
+        return [(x, y, self.width, self.height) for x, y in zip(self.x[live].tolist(), self.y[live].tolist())]
+
+class SpatialHash:
+    """Uniform grid broad phase over whole arrays of boxes.
+
+    insert() records the cells each box overlaps as (cell key, index) arrays
+    per kind; candidate_pairs() joins two kinds on the cell key with a sort
+    and searchsorted, so no Python code runs per entity.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.entries = {} # kind -> list of (cell keys, indices) arrays
+
+    def clear(self):
+        self.entries.clear()
+
+    def insert(self, kind, index, x, y, width, height):
+        size = self.cell_size
+        x0, x1 = x // size, (x + width - 1) // size
+        y0, y1 = y // size, (y + height - 1) // size
+        parts = self.entries.setdefault(kind, [])
+        for dx in range((width - 1) // size + 2): # Enough offsets for any alignment
+            for dy in range((height - 1) // size + 2):
+                covered = (x0 + dx <= x1) & (y0 + dy <= y1)
+                cells = (x0[covered] + dx).astype(np.int64) * (1 << 20) + (y0[covered] + dy)
+                parts.append((cells, index[covered]))
+
+    def cells(self, kind):
+        parts = self.entries.get(kind)
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate([c for c, _ in parts]), np.concatenate([i for _, i in parts])
+
+    def candidate_pairs(self, kind_a, kind_b):
+        """Broad phase: (index_a, index_b) arrays of entities that share a cell, sorted, no repeats."""
+        cells_a, index_a = self.cells(kind_a)
+        cells_b, index_b = self.cells(kind_b)
+        order = np.argsort(cells_b, kind="stable")
+        cells_b, index_b = cells_b[order], index_b[order]
+        lo = np.searchsorted(cells_b, cells_a, side="left")
+        counts = np.searchsorted(cells_b, cells_a, side="right") - lo
+        total = int(counts.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        first = np.repeat(index_a, counts)
+        second = index_b[starts + np.arange(total)]
+        stride = int(index_b.max()) + 1
+        pairs = np.unique(first.astype(np.int64) * stride + second)
+        return pairs // stride, pairs % stride
+
+def overlapping(pool_a, a, pool_b, b):
+    """Narrow phase: which candidate pairs really overlap (pygame.Rect.colliderect rules)."""
+    return ((pool_a.x[a] < pool_b.x[b] + pool_b.width) & (pool_b.x[b] < pool_a.x[a] + pool_a.width) &
+            (pool_a.y[a] < pool_b.y[b] + pool_b.height) & (pool_b.y[b] < pool_a.y[a] + pool_a.height))
+
+class Formation:
+    """The enemy pool plus its bounding box, kept up to date as enemies move and die.
+
+    Moving shifts the bounds directly; a kill only rescans the live enemies
+    when the dead one was on an edge.
+    """
+
+    def __init__(self):
+        self.pool = EntityPool(50, 40)
+        self.reset()
+
+    def reset(self):
+        self.pool.clear()
+        self.pool.spawn([x*70+50 for y in range(4) for x in range(8)], [y*60+50 for y in range(4) for x in range(8)])
+        self.update_bounds()
+
+    def update_bounds(self):
+        live = self.pool.live()
+        self.count = len(live)
+        self.left = int(self.pool.x[live].min()) if self.count else 0
+        self.right = int(self.pool.x[live].max()) + self.pool.width if self.count else 0
+        self.bottom = int(self.pool.y[live].max()) + self.pool.height if self.count else 0
+
+    def shift(self, dx, dy):
+        self.pool.vx[:], self.pool.vy[:] = dx, dy
+        self.pool.move()
+        self.left += dx
+        self.right += dx
+        self.bottom += dy
+
+    def remove(self, slots):
+        pool = self.pool
+        pool.kill(slots)
+        self.count -= len(slots)
+        x, y = pool.x[slots], pool.y[slots]
+        if (x == self.left).any() or (x + pool.width == self.right).any() or (y + pool.height == self.bottom).any():
+            self.update_bounds()
+
 player = pygame.Rect(370, 550, 60, 30)
-bullets = []
-enemies = [pygame.Rect(x*70+50, y*60+50, 50, 40) for y in range(4) for x in range(8)]
-enemy_bullets = []
+bullets = EntityPool(5, 10)
+formation = Formation()
+enemy_bullets = EntityPool(5, 10, capacity=256)
+player_pool = EntityPool(player.width, player.height, capacity=1) # The player's box, for the spatial hash
+player_pool.spawn(player.x, player.y)
+grid = SpatialHash()
 enemy_dir = 1
 enemy_speed = 2
 score = 0
 font = pygame.font.Font(None, 36)
 
 def reset_game():
-    global player, enemies, bullets, enemy_bullets, score, enemy_speed
+    global score, enemy_speed
     player.x = 370
-    enemies = [pygame.Rect(x*70+50, y*60+50, 50, 40) for y in range(4) for x in range(8)]
-    bullets = []
-    enemy_bullets = []
+    formation.reset()
+    bullets.clear()
+    enemy_bullets.clear()
     score = 0
     enemy_speed = 2
 
@@ -31,61 +186,70 @@ while running:
             running = False
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SPACE:
-                bullets.append(pygame.Rect(player.centerx-2, player.y-10, 5, 10))
+                bullets.spawn(player.centerx-2, player.y-10, vy=-10)
 
     keys = pygame.key.get_pressed()
     if keys[pygame.K_LEFT] and player.left > 0:
         player.x -= 5
     if keys[pygame.K_RIGHT] and player.right < 800:
         player.x += 5
+    player_pool.x[0], player_pool.y[0] = player.x, player.y
 
-    for bullet in bullets[:]:
-        bullet.y -= 10
-        if bullet.bottom < 0:
-            bullets.remove(bullet)
+    bullets.move()
+    bullets.cull(0, 600)
 
-    for enemy in enemies[:]:
-        enemy.x += enemy_dir * enemy_speed
-        if random.random() < 0.005:
-            enemy_bullets.append(pygame.Rect(enemy.centerx-2, enemy.y+40, 5, 10))
+    formation.shift(enemy_dir * enemy_speed, 0)
+    enemies = formation.pool
+    live = enemies.live()
+    shooters = live[rng.random(len(live)) < FIRE_CHANCE] # One draw for the whole formation
+    if len(shooters):
+        enemy_bullets.spawn(enemies.x[shooters] + enemies.width // 2 - 2, enemies.y[shooters] + 40, vy=5)
 
-    if enemies and (min(e.x for e in enemies) <= 0 or max(e.right for e in enemies) >= 800):
+    if formation.count and (formation.left <= 0 or formation.right >= 800):
         enemy_dir *= -1
-        for enemy in enemies:
-            enemy.y += 30
-
-    for bullet in enemy_bullets[:]:
-        bullet.y += 5
-        if bullet.top > 600:
-            enemy_bullets.remove(bullet)
-        if bullet.colliderect(player):
-            reset_game()
-
-    for bullet in bullets[:]:
-        for enemy in enemies[:]:
-            if bullet.colliderect(enemy):
-                bullets.remove(bullet)
-                enemies.remove(enemy)
-                score += 10
-                break
-
-    if any(enemy.bottom >= player.top for enemy in enemies):
+        formation.shift(0, 30)
+
+    enemy_bullets.move()
+    enemy_bullets.cull(0, 600)
+
+    grid.clear()
+    for kind, pool in (("enemy", enemies), ("bullet", bullets), ("enemy_bullet", enemy_bullets), ("player", player_pool)):
+        live = pool.live()
+        grid.insert(kind, live, pool.x[live], pool.y[live], pool.width, pool.height)
+
+    b, p = grid.candidate_pairs("enemy_bullet", "player")
+    if overlapping(enemy_bullets, b, player_pool, p).any():
+        reset_game()
+    else:
+        b, e = grid.candidate_pairs("bullet", "enemy")
+        hit = overlapping(bullets, b, enemies, e)
+        hit_bullets, hit_enemies = set(), set()
+        for bullet, enemy in zip(b[hit].tolist(), e[hit].tolist()): # Each bullet kills at most one enemy
+            if bullet not in hit_bullets and enemy not in hit_enemies:
+                hit_bullets.add(bullet)
+                hit_enemies.add(enemy)
+        if hit_enemies:
+            bullets.kill(list(hit_bullets))
+            formation.remove(list(hit_enemies))
+            score += 10 * len(hit_enemies)
+
+    if formation.count and formation.bottom >= player.top:
         reset_game()
 
-    if not enemies:
-        enemies = [pygame.Rect(x*70+50, y*60+50, 50, 40) for y in range(4) for x in range(8)]
+    if not formation.count:
+        formation.reset()
         enemy_speed = 2
 
     screen.fill((0, 0, 0))
     pygame.draw.rect(screen, (0, 255, 0), player)
-    for bullet in bullets:
-        pygame.draw.rect(screen, (255, 255, 0), bullet)
-    for enemy in enemies:
-        pygame.draw.rect(screen, (255, 0, 0), enemy)
-    for bullet in enemy_bullets:
-        pygame.draw.rect(screen, (255, 255, 255), bullet)
+    for rect in bullets.rects():
+        screen.fill((255, 255, 0), rect)
+    for rect in enemies.rects():
+        screen.fill((255, 0, 0), rect)
+    for rect in enemy_bullets.rects():
+        screen.fill((255, 255, 255), rect)
     screen.blit(font.render(f"Score: {score}", True, (255, 255, 255)), (10, 10))
-    
+
     pygame.display.flip()
     clock.tick(60)
 
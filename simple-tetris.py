@@ -1,42 +1,62 @@
 # Simple Tetris Game in Python
 # @CodingTogether
+# Board size is optional: python simple-tetris.py [columns rows], e.g. 100 200
+import sys
 import pygame
 import random
+import numpy as np
+
+BOARD_COLS, BOARD_ROWS = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) == 3 else (10, 20)
+CELL = max(1, min(30, 300 // BOARD_COLS, 600 // BOARD_ROWS)) # Fit the board into the usual 300x600 window
 
 pygame.init()
-screen = pygame.display.set_mode((300, 600))
+screen = pygame.display.set_mode((BOARD_COLS * CELL, BOARD_ROWS * CELL))
 clock = pygame.time.Clock()
-grid = [[0 for _ in range(10)] for _ in range(20)]
+grid = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=np.uint8) # 0 = empty, otherwise colour index + 1
 shapes = [[[1,1,1,1]], [[1,1],[1,1]], [[1,1,1],[0,1,0]], [[1,1,1],[1,0,0]], [[1,1,1],[0,0,1]], [[1,1,0],[0,1,1]], [[0,1,1],[1,1,0]]]
 colors = [(255,0,0), (0,255,0), (0,0,255), (255,255,0), (255,0,255), (0,255,255), (255,165,0)]
-current_shape = random.choice(shapes)
-current_color = random.choice(colors)
-shape_x, shape_y = 3, 0
+palette = np.array([(0, 0, 0)] + colors, dtype=np.uint8) # grid value -> RGB
+
+# Every distinct clockwise rotation of every shape, as tight boolean masks
+rotations = []
+for shape in shapes:
+    masks = []
+    for turn in range(4):
+        mask = np.rot90(np.array(shape, dtype=bool), -turn)
+        if not any(np.array_equal(mask, seen) for seen in masks):
+            masks.append(mask)
+    rotations.append(masks)
+
+def new_shape():
+    return random.randrange(len(shapes)), 0, random.randrange(len(colors)) + 1
+
+shape_index, rotation, current_color = new_shape()
+current_shape = rotations[shape_index][rotation]
+shape_x, shape_y = BOARD_COLS // 2 - 2, 0
 score = 0
 font = pygame.font.Font(None, 36)
 
 def can_move(shape, x, y):
-    for i, row in enumerate(shape):
-        for j, cell in enumerate(row):
-            if cell and (x+j < 0 or x+j >= 10 or y+i >= 20 or (y+i >= 0 and grid[y+i][x+j])):
-                return False
-    return True
-    
+    h, w = shape.shape
+    if x < 0 or x + w > BOARD_COLS or y + h > BOARD_ROWS:
+        return False
+    top = max(y, 0) # Rows above the board are always free
+    return not (grid[top:y+h, x:x+w].astype(bool) & shape[top-y:]).any()
+
 def place_shape():
-    global current_shape, current_color, shape_x, shape_y, score
-    for i, row in enumerate(current_shape):
-        for j, cell in enumerate(row):
-            if cell:
-                grid[shape_y+i][shape_x+j] = current_color
-    for i in range(19, -1, -1):
-        if all(grid[i]):
-            del grid[i]
-            grid.insert(0, [0 for _ in range(10)])
-            score += 100
-    current_shape = random.choice(shapes)
-    current_color = random.choice(colors)
-    shape_x, shape_y = 3, 0
-    
+    global grid, shape_index, rotation, current_shape, current_color, shape_x, shape_y, score
+    h, w = current_shape.shape
+    grid[shape_y:shape_y+h, shape_x:shape_x+w][current_shape] = current_color
+    # Only the rows the shape landed in can have filled up
+    if grid[shape_y:shape_y+h].all(axis=1).any():
+        full = grid.all(axis=1)
+        cleared = int(full.sum())
+        grid = np.concatenate([np.zeros((cleared, BOARD_COLS), dtype=grid.dtype), grid[~full]])
+        score += 100 * cleared
+    shape_index, rotation, current_color = new_shape()
+    current_shape = rotations[shape_index][rotation]
+    shape_x, shape_y = BOARD_COLS // 2 - 2, 0
+
 running = True
 fall_time = 0
 
@@ -51,25 +71,26 @@ while running:
                 shape_x += 1
             elif event.key == pygame.K_DOWN and can_move(current_shape, shape_x, shape_y+1):
                 shape_y += 1
+            elif event.key == pygame.K_UP:
+                turned = rotations[shape_index][(rotation + 1) % len(rotations[shape_index])]
+                if can_move(turned, shape_x, shape_y):
+                    rotation = (rotation + 1) % len(rotations[shape_index])
+                    current_shape = turned
     fall_time += clock.get_time()
     if fall_time >= 500:
         if can_move(current_shape, shape_x, shape_y+1):
             shape_y += 1
         else:
             place_shape()
-        fall_time = 0  
-    screen.fill((0, 0, 0))
-    for i, row in enumerate(grid):
-        for j, cell in enumerate(row):
-            if cell:
-                pygame.draw.rect(screen, cell, (j*30, i*30, 30, 30))
-    for i, row in enumerate(current_shape):
-        for j, cell in enumerate(row):
-            if cell:
-                pygame.draw.rect(screen, current_color, ((shape_x+j)*30, (shape_y+i)*30, 30, 30))
+        fall_time = 0
+    # One palette lookup paints the whole board, however many cells it has
+    board = pygame.surfarray.make_surface(palette[grid].transpose(1, 0, 2))
+    screen.blit(pygame.transform.scale(board, screen.get_size()), (0, 0))
+    for i, j in zip(*np.nonzero(current_shape)):
+        pygame.draw.rect(screen, colors[current_color - 1], ((shape_x+j)*CELL, (shape_y+i)*CELL, CELL, CELL))
     score_text = font.render(f"Score: {score}", True, (255, 255, 255))
     screen.blit(score_text, (10, 10))
     pygame.display.flip()
     clock.tick(60)
-    
+
 pygame.quit()
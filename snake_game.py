@@ -1,32 +1,25 @@
+# Board size is optional: python snake_game.py [columns rows], e.g. 200 200
+import sys
 import pygame
-import random
+from arcade_env import SnakeState, step_snake, SNAKE_MOVES, SNAKE_COLS, SNAKE_ROWS
+
+COLS, ROWS = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) == 3 else (SNAKE_COLS, SNAKE_ROWS)
+CELL = max(1, min(20, 400 // COLS, 400 // ROWS)) # Fit the board into the usual 400x400 window
 
 # Initialize global variables
 FPS = 15
 screen = None
 clock = None
-snake = [(200, 200)]
-snake_dir = (0, 0)
-food = None
-score = 0
+state = SnakeState(cols=COLS, rows=ROWS) # Snake, direction, food and score; the rules are in arcade_env.py
 font = None
 running = True
 
 # Initialize Pygame and set up display
 pygame.init()
-screen = pygame.display.set_mode((400, 400))
+screen = pygame.display.set_mode((COLS * CELL, ROWS * CELL))
 clock = pygame.time.Clock()
-food = pygame.Rect(random.randrange(0, 380, 20), random.randrange(0, 380, 20), 20, 20)
 font = pygame.font.Font(None, 36)
 
-# Define game reset function
-def reset_game():
-    global snake, snake_dir, food, score
-    snake = [(200, 200)]
-    snake_dir = (0, 0)
-    food.topleft = (random.randrange(0, 380, 20), random.randrange(0, 380, 20))
-    score = 0
-
 # Run main game loop
 while running:
     # Handle user input events
@@ -34,35 +27,25 @@ while running:
         if event.type == pygame.QUIT:
             running = False
 
-    # Update snake direction from keyboard
+    # Update snake direction from keyboard: the first held key that is not a
+    # U-turn, as an index into SNAKE_MOVES; 0 keeps going
     keys = pygame.key.get_pressed()
-    if keys[pygame.K_UP] and snake_dir != (0, 20): snake_dir = (0, -20)
-    elif keys[pygame.K_DOWN] and snake_dir != (0, -20): snake_dir = (0, 20)
-    elif keys[pygame.K_LEFT] and snake_dir != (20, 0): snake_dir = (-20, 0)
-    elif keys[pygame.K_RIGHT] and snake_dir != (-20, 0): snake_dir = (20, 0)
+    dx, dy = state.direction
+    arrows = (pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT)
+    action = next((i for i, key in enumerate(arrows, 1) if keys[key] and SNAKE_MOVES[i] != (-dx, -dy)), 0)
 
     # Move snake and check collisions
-    if snake_dir != (0, 0):
-        head = (snake[0][0] + snake_dir[0], snake[0][1] + snake_dir[1])
-        snake.insert(0, head)
-        if pygame.Rect(head, (20, 20)).colliderect(food):
-            score += 1
-            place_food= False
-            while not place_food:
-                food.topleft = (random.randrange(0, 380, 20), random.randrange(0, 380, 20))
-                if food.topleft not in snake:
-                    place_food = True
-        else:
-            snake.pop()
-        if head in snake[1:] or head[0] < 0 or head[0] >= 400 or head[1] < 0 or head[1] >= 400:
-            reset_game()
+    _reward, done = step_snake(state, action)
+    if done:
+        state.reset()
 
     # Render game graphics
     screen.fill((0, 0, 0))
-    for pos in snake:
-        pygame.draw.rect(screen, (0, 255, 0), (pos[0], pos[1], 20, 20))
-    pygame.draw.rect(screen, (255, 0, 0), food)
-    score_text = font.render(f"Score: {score}", True, (255, 255, 255))
+    for x, y in state.snake:
+        screen.fill((0, 255, 0), (x * CELL, y * CELL, CELL, CELL))
+    if state.food is not None:
+        screen.fill((255, 0, 0), (state.food[0] * CELL, state.food[1] * CELL, CELL, CELL))
+    score_text = font.render(f"Score: {state.score}", True, (255, 255, 255))
     screen.blit(score_text, (10, 10))
     pygame.display.flip()
     clock.tick(FPS)